@@ -1,48 +1,323 @@
+import atexit
+import logging
+import os
+import queue
 import sqlite3
+import threading
+import time
 
-def create_database():
-    conn = sqlite3.connect('responses.db')
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS responses (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_input TEXT,
-            response TEXT,
-            rating INTEGER,
-            intent TEXT,
-            expected_intent TEXT,
-            confidence REAL,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    conn.commit()
-    conn.close()
-
-def save_rating(user_input, response, rating, intent, expected_intent, confidence):
-    conn = sqlite3.connect('responses.db')
-    c = conn.cursor()
-    c.execute('''
-        INSERT INTO responses (user_input, response, rating, intent, expected_intent, confidence)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (user_input, response, rating, intent, expected_intent, confidence))
-    conn.commit()
-    conn.close()
-
-def fetch_feedback():
-    conn = sqlite3.connect('responses.db')
-    c = conn.cursor()
-    c.execute('''
-        SELECT user_input, expected_intent, confidence, rating
-        FROM responses
-        WHERE rating < 3 
-    ''')
-    feedback_data = c.fetchall()
-    conn.close()
-    return feedback_data
+logger = logging.getLogger(__name__)
+
+CREATE_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS responses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_input TEXT,
+        response TEXT,
+        rating INTEGER,
+        intent TEXT,
+        expected_intent TEXT,
+        confidence REAL,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+CREATE_INDEXES_SQL = (
+    'CREATE INDEX IF NOT EXISTS idx_responses_rating ON responses (rating)',
+    'CREATE INDEX IF NOT EXISTS idx_responses_intents ON responses (intent, expected_intent)',
+    'CREATE INDEX IF NOT EXISTS idx_responses_timestamp ON responses (timestamp)',
+)
+
+INSERT_RATING_SQL = '''
+    INSERT INTO responses (user_input, response, rating, intent, expected_intent, confidence)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+FETCH_FEEDBACK_SQL = '''
+    SELECT user_input, expected_intent, confidence, rating
+    FROM responses
+    WHERE rating < 3
+'''
+
+FETCH_FEEDBACK_SINCE_SQL = '''
+    SELECT id, user_input, expected_intent, confidence, rating
+    FROM responses
+    WHERE rating < 3 AND id > ?
+    ORDER BY id
+'''
+
+FETCH_MISCLASSIFIED_SQL = '''
+    SELECT user_input, expected_intent
+    FROM responses
+    WHERE intent != expected_intent OR confidence < 0.5
+'''
+
+BROWSE_COLUMNS = ('id', 'user_input', 'response', 'rating', 'intent', 'expected_intent', 'confidence')
+SORTABLE_COLUMNS = BROWSE_COLUMNS + ('timestamp',)
+
+class FeedbackStore:
+    def __init__(self, db_path='responses.db', batch_size=64, flush_interval=0.5, max_retries=5, retry_delay=0.1):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        # Rows the writer could not store because the database stayed locked; flush() tries them once more and raises if
+        # that fails. Rows rejected for any other reason are logged and dropped, they would never succeed.
+        self._failed_rows = []
+        self._failed_lock = threading.Lock()
+
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._closed = False
+
+        self.create_database()
+        self._writer = threading.Thread(target=self._write_loop, name='FeedbackWriter', daemon=True)
+        self._writer.start()
+
+    @property
+    def connection(self):
+        # sqlite3 connections must stay on the thread that created them, so each thread keeps its own.
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, cached_statements=128)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def create_database(self):
+        conn = self.connection
+        with conn:
+            conn.execute(CREATE_TABLE_SQL)
+            for statement in CREATE_INDEXES_SQL:
+                conn.execute(statement)
+
+    def save_rating(self, user_input, response, rating, intent, expected_intent, confidence):
+        if self._closed:
+            raise RuntimeError(f"FeedbackStore for '{self.db_path}' is closed")
+        self._queue.put((user_input, response, rating, intent, expected_intent, confidence))
+
+    def flush(self):
+        self._queue.join()
+        with self._failed_lock:
+            rows, self._failed_rows = self._failed_rows, []
+        if not rows:
+            return
+
+        pending, error = self._write_rows(rows)
+        if pending:
+            with self._failed_lock:
+                self._failed_rows = pending + self._failed_rows
+            raise sqlite3.OperationalError(f"{len(pending)} feedback rows could not be written to {self.db_path}: {error}") from error
+
+    @staticmethod
+    def _is_transient(error):
+        message = str(error).lower()
+        return isinstance(error, sqlite3.OperationalError) and ('locked' in message or 'busy' in message)
+
+    def _execute(self, rows):
+        delay = self.retry_delay
+        for attempt in range(self.max_retries):
+            try:
+                with self.connection as conn:
+                    conn.executemany(INSERT_RATING_SQL, rows)
+                return None
+            except sqlite3.Error as e:
+                if not self._is_transient(e):
+                    return e
+                error = e
+                logger.warning(f"Writing {len(rows)} feedback rows to {self.db_path} failed (attempt {attempt + 1}/{self.max_retries}): {e}")
+                if attempt < self.max_retries - 1:
+                    time.sleep(delay)
+                    delay *= 2
+        return error
+
+    def _write_rows(self, rows):
+        # Returns the rows that are still unwritten because the database stayed locked, and the last such error.
+        error = self._execute(rows)
+        if error is None:
+            return [], None
+        if self._is_transient(error):
+            return rows, error
+
+        # One bad row fails the whole executemany, so the batch is replayed row by row to keep the good ones.
+        pending, last_error = [], None
+        for row in rows:
+            error = self._execute([row])
+            if error is None:
+                continue
+            if self._is_transient(error):
+                pending.append(row)
+                last_error = error
+            else:
+                logger.error(f"Dropping feedback row {row!r}, {self.db_path} rejected it: {type(error).__name__}: {error}")
+        return pending, last_error
+
+    def _write_loop(self):
+        while True:
+            row = self._queue.get()
+            if row is None:
+                self._queue.task_done()
+                return
+
+            rows = [row]
+            stop = False
+            while len(rows) < self.batch_size:
+                try:
+                    row = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    break
+                if row is None:
+                    stop = True
+                    break
+                rows.append(row)
+
+            try:
+                pending, error = self._write_rows(rows)
+                if pending:
+                    logger.error(f"Keeping {len(pending)} feedback rows for the next flush, writing them to {self.db_path} failed: {error}")
+                    with self._failed_lock:
+                        self._failed_rows.extend(pending)
+            finally:
+                for _ in rows:
+                    self._queue.task_done()
+
+            if stop:
+                self._queue.task_done()
+                return
+
+    def fetch_feedback(self):
+        self.flush()
+        return self.connection.execute(FETCH_FEEDBACK_SQL).fetchall()
+
+    def fetch_feedback_since(self, last_id=0):
+        self.flush()
+        return self.connection.execute(FETCH_FEEDBACK_SINCE_SQL, (last_id,)).fetchall()
+
+    def fetch_misclassified_examples(self):
+        self.flush()
+        return self.connection.execute(FETCH_MISCLASSIFIED_SQL).fetchall()
+
+    def fetch_page(self, page_size=200, cursor=None, sort_column='id', descending=False, search=None, intent=None, max_rating=None):
+        # Keyset pagination: the cursor is the (sort value, id) of the previous page's last row, so every page
+        # costs the same index seek however deep into the table it is.
+        if sort_column not in SORTABLE_COLUMNS:
+            raise ValueError(f"Cannot sort by '{sort_column}', expected one of {SORTABLE_COLUMNS}")
+
+        conditions = []
+        params = []
+        if search:
+            conditions.append('(user_input LIKE ? OR response LIKE ?)')
+            params += [f'%{search}%'] * 2
+        if intent:
+            conditions.append('(intent = ? OR expected_intent = ?)')
+            params += [intent] * 2
+        if max_rating is not None:
+            conditions.append('rating <= ?')
+            params.append(max_rating)
+
+        direction, comparison = ('DESC', '<') if descending else ('ASC', '>')
+        if cursor is not None:
+            if sort_column == 'id':
+                conditions.append(f'id {comparison} ?')
+                params.append(cursor[1])
+            elif cursor[0] is None:
+                # SQLite sorts NULLs first, and a row-value comparison against NULL is never true.
+                if descending:
+                    conditions.append(f'({sort_column} IS NULL AND id < ?)')
+                else:
+                    conditions.append(f'(({sort_column} IS NULL AND id > ?) OR {sort_column} IS NOT NULL)')
+                params.append(cursor[1])
+            elif descending:
+                conditions.append(f'(({sort_column}, id) < (?, ?) OR {sort_column} IS NULL)')
+                params += list(cursor)
+            else:
+                conditions.append(f'({sort_column}, id) > (?, ?)')
+                params += list(cursor)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        order = f'id {direction}' if sort_column == 'id' else f'{sort_column} {direction}, id {direction}'
+        sql = f"SELECT {', '.join(BROWSE_COLUMNS)}, {sort_column} FROM responses {where} ORDER BY {order} LIMIT ?"
+
+        self.flush()
+        rows = self.connection.execute(sql, params + [page_size]).fetchall()
+        next_cursor = (rows[-1][-1], rows[-1][0]) if len(rows) == page_size else None
+        return [row[:-1] for row in rows], next_cursor
+
+    def delete_rows(self, row_ids):
+        self.flush()
+        with self.connection as conn:
+            conn.executemany('DELETE FROM responses WHERE id = ?', [(row_id,) for row_id in row_ids])
+
+    def update_expected_intent(self, row_id, expected_intent):
+        self.flush()
+        with self.connection as conn:
+            conn.execute('UPDATE responses SET expected_intent = ? WHERE id = ?', (expected_intent, row_id))
+
+    def save_sample_to_db(self, sample_df):
+        with self.connection as conn:
+            sample_df.to_sql('original_dataset', conn, if_exists='replace', index=False)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+        with self._connections_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.ProgrammingError:
+                    # Connections opened by other threads cannot be closed from here; they close on collection.
+                    pass
+            self._connections.clear()
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_store(db_path='responses.db'):
+    key = os.path.abspath(db_path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None or store._closed:
+            store = FeedbackStore(db_path)
+            _stores[key] = store
+        return store
+
+def _forget_stores_after_fork():
+    # A forked child must not touch the parent's stores: their sqlite connections cannot cross a fork, their writer
+    # thread does not exist in the child, and their locks may have been copied while held. The child opens its own
+    # store on first use instead.
+    global _stores_lock
+    _stores_lock = threading.Lock()
+    _stores.clear()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_stores_after_fork)
+
+@atexit.register
+def close_stores():
+    with _stores_lock:
+        for store in _stores.values():
+            store.close()
+        _stores.clear()
+
+def create_database(db_path='responses.db'):
+    get_store(db_path).create_database()
+
+def save_rating(user_input, response, rating, intent, expected_intent, confidence, db_path='responses.db'):
+    get_store(db_path).save_rating(user_input, response, rating, intent, expected_intent, confidence)
+
+def fetch_feedback(db_path='responses.db'):
+    return get_store(db_path).fetch_feedback()
+
+def fetch_feedback_since(last_id=0, db_path='responses.db'):
+    return get_store(db_path).fetch_feedback_since(last_id)
 
 def save_sample_to_db(sample_df, db_path='responses.db'):
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-    sample_df.to_sql('original_dataset', conn, if_exists='replace', index=False)
-    conn.commit()
-    conn.close()
+    get_store(db_path).save_sample_to_db(sample_df)
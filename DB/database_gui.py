@@ -1,13 +1,31 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import queue
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox
 from tkinter import simpledialog
-import sqlite3
 import ttkbootstrap as tb
 from ttkbootstrap.constants import *
+from DB.database import get_store
+
+COLUMN_FIELDS = {
+    'ID': 'id',
+    'User Input': 'user_input',
+    'Response': 'response',
+    'Rating': 'rating',
+    'Intent': 'intent',
+    'Expected Intent': 'expected_intent',
+    'Confidence': 'confidence',
+}
 
 class DatabaseManager:
-    def __init__(self, root):
+    def __init__(self, root, db_path='../TGBot/responses.db', page_size=200):
         self.root = root
+        self.store = get_store(db_path)
+        self.page_size = page_size
         self.root.title("Database Manager")
         self.root.geometry("1000x600")
         self.style = tb.Style("flatly")
@@ -31,6 +49,23 @@ class DatabaseManager:
         self.tree.heading("Intent", text="Intent", anchor=tk.W)
         self.tree.heading("Expected Intent", text="Expected Intent", anchor=tk.W)
         self.tree.heading("Confidence", text="Confidence", anchor=tk.W)
+        for column in COLUMN_FIELDS:
+            self.tree.heading(column, command=lambda column=column: self.sort_by(column))
+
+        filter_frame = ttk.Frame(self.root)
+        filter_frame.pack(pady=(10, 0), fill=tk.X, padx=20)
+        ttk.Label(filter_frame, text="Search:").pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        search_entry = ttk.Entry(filter_frame, textvariable=self.search_var, width=30)
+        search_entry.pack(side=tk.LEFT, padx=5)
+        search_entry.bind("<Return>", lambda event: self.load_data())
+        ttk.Label(filter_frame, text="Intent:").pack(side=tk.LEFT, padx=(10, 0))
+        self.intent_var = tk.StringVar()
+        ttk.Entry(filter_frame, textvariable=self.intent_var, width=15).pack(side=tk.LEFT, padx=5)
+        ttk.Label(filter_frame, text="Max rating:").pack(side=tk.LEFT, padx=(10, 0))
+        self.max_rating_var = tk.StringVar()
+        ttk.Combobox(filter_frame, textvariable=self.max_rating_var, values=('', '1', '2', '3', '4', '5'), width=4, state='readonly').pack(side=tk.LEFT, padx=5)
+        ttk.Button(filter_frame, text="Apply", command=self.load_data, bootstyle="info").pack(side=tk.LEFT, padx=10)
 
         self.tree.pack(pady=20, fill=tk.BOTH, expand=True)
 
@@ -46,21 +81,117 @@ class DatabaseManager:
         self.edit_intent_button = ttk.Button(button_frame, text="Edit Expected Intent", command=self.edit_expected_intent, bootstyle="warning")
         self.edit_intent_button.grid(row=0, column=2, padx=10)
 
+        self.prev_page_button = ttk.Button(button_frame, text="< Prev", command=self.prev_page, bootstyle="secondary")
+        self.prev_page_button.grid(row=0, column=3, padx=10)
+
+        self.next_page_button = ttk.Button(button_frame, text="Next >", command=self.next_page, bootstyle="secondary")
+        self.next_page_button.grid(row=0, column=4, padx=10)
+
+        self.status_label = ttk.Label(button_frame, text="")
+        self.status_label.grid(row=0, column=5, padx=10)
+
         self.tree.bind("<Double-1>", self.display_thought_process)
 
-        self.load_data()
+        # Only one page of rows is ever held in the Treeview; page_cursors[i] is the keyset cursor that starts page i.
+        self.sort_column = 'id'
+        self.sort_descending = True
+        self.page_cursors = [None]
+        self.page_index = 0
+        self.next_cursor = None
+        self.request_id = 0
 
-    def load_data(self):
-        for i in self.tree.get_children():
-            self.tree.delete(i)
+        # SQLite work runs on a background thread; its results come back through ui_queue and are applied on the Tk thread.
+        self.db_queue = queue.Queue()
+        self.ui_queue = queue.Queue()
+        threading.Thread(target=self.db_worker, name='DatabaseManagerWorker', daemon=True).start()
+        self.process_ui_queue()
+
+        self.load_data()
 
-        conn = sqlite3.connect('../TGBot/responses.db')
-        c = conn.cursor()
-        c.execute("SELECT * FROM responses")
-        rows = c.fetchall()
+    def db_worker(self):
+        while True:
+            task, callback = self.db_queue.get()
+            try:
+                result, error = task(), None
+            except Exception as e:
+                result, error = None, e
+            self.ui_queue.put((callback, result, error))
+
+    def submit(self, task, callback):
+        self.db_queue.put((task, callback))
+
+    def process_ui_queue(self):
+        try:
+            while True:
+                callback, result, error = self.ui_queue.get_nowait()
+                if error is not None:
+                    messagebox.showerror("Database error", str(error))
+                else:
+                    callback(result)
+        except queue.Empty:
+            pass
+        self.root.after(50, self.process_ui_queue)
+
+    def current_filters(self):
+        max_rating = self.max_rating_var.get()
+        return {
+            'search': self.search_var.get().strip() or None,
+            'intent': self.intent_var.get().strip() or None,
+            'max_rating': int(max_rating) if max_rating else None,
+            'sort_column': self.sort_column,
+            'descending': self.sort_descending,
+        }
+
+    def fetch_page(self, page_index):
+        self.request_id += 1
+        request_id = self.request_id
+        cursor = self.page_cursors[page_index]
+        filters = self.current_filters()
+        self.status_label.config(text="Loading...")
+
+        def show(result):
+            # A newer request (filter change, page click) supersedes this one.
+            if request_id == self.request_id:
+                self.show_page(page_index, *result)
+
+        self.submit(lambda: self.store.fetch_page(self.page_size, cursor, **filters), show)
+
+    def show_page(self, page_index, rows, next_cursor):
+        self.page_index = page_index
+        self.next_cursor = next_cursor
+        del self.page_cursors[page_index + 1:]
+
+        self.tree.delete(*self.tree.get_children())
         for row in rows:
-            self.tree.insert("", tk.END, values=row)
-        conn.close()
+            self.tree.insert("", tk.END, iid=str(row[0]), values=row)
+
+        first = page_index * self.page_size
+        self.status_label.config(text=f"Rows {first + 1 if rows else first}-{first + len(rows)}")
+        self.prev_page_button.config(state=tk.NORMAL if page_index > 0 else tk.DISABLED)
+        self.next_page_button.config(state=tk.NORMAL if next_cursor is not None else tk.DISABLED)
+
+    def next_page(self):
+        if self.next_cursor is None:
+            return
+        self.page_cursors.append(self.next_cursor)
+        self.fetch_page(self.page_index + 1)
+
+    def prev_page(self):
+        if self.page_index > 0:
+            self.fetch_page(self.page_index - 1)
+
+    def sort_by(self, column):
+        field = COLUMN_FIELDS[column]
+        if self.sort_column == field:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_column = field
+            self.sort_descending = False
+        self.load_data()
+
+    def load_data(self):
+        self.page_cursors = [None]
+        self.fetch_page(0)
 
     def delete_selected(self):
         selected_item = self.tree.selection()
@@ -68,16 +199,16 @@ class DatabaseManager:
             messagebox.showwarning("No selection", "Please select an item to delete")
             return
 
-        conn = sqlite3.connect('../TGBot/responses.db')
-        c = conn.cursor()
-        for item in selected_item:
-            item_id = self.tree.item(item, 'values')[0]
-            c.execute("DELETE FROM responses WHERE id=?", (item_id,))
-        conn.commit()
-        conn.close()
+        row_ids = [int(self.tree.item(item, 'values')[0]) for item in selected_item]
 
-        self.load_data()
-        messagebox.showinfo("Deleted", "Selected item(s) deleted successfully")
+        def remove_rows(result):
+            # Only the deleted rows leave the view; the rest of the page stays as it is.
+            for item in selected_item:
+                if self.tree.exists(item):
+                    self.tree.delete(item)
+            messagebox.showinfo("Deleted", "Selected item(s) deleted successfully")
+
+        self.submit(lambda: self.store.delete_rows(row_ids), remove_rows)
 
     def display_thought_process(self, event):
         selected_item = self.tree.selection()[0]
@@ -109,14 +240,12 @@ class DatabaseManager:
 
         new_intent = simpledialog.askstring("Edit Expected Intent", "Enter new Expected Intent:", initialvalue=current_intent, parent=self.root)
         if new_intent is not None:
-            conn = sqlite3.connect('../TGBot/responses.db')
-            c = conn.cursor()
-            c.execute("UPDATE responses SET expected_intent=? WHERE id=?", (new_intent, item_id))
-            conn.commit()
-            conn.close()
-
-            self.load_data()
-            messagebox.showinfo("Updated", "Expected Intent updated successfully")
+            def update_row(result):
+                if self.tree.exists(selected_item):
+                    self.tree.set(selected_item, 'Expected Intent', new_intent)
+                messagebox.showinfo("Updated", "Expected Intent updated successfully")
+
+            self.submit(lambda: self.store.update_expected_intent(item_id, new_intent), update_row)
 
 if __name__ == "__main__":
     root = tb.Window(themename="flatly")
@@ -1,24 +1,25 @@
 import pandas as pd
 import tkinter as tk
 from tkinter import ttk, messagebox
-from langdetect import detect, DetectorFactory
 from googletrans import Translator
-import langid
-from collections import Counter
-import re
+import queue
 import threading
-
-DetectorFactory.seed = 0
+from language_detection import LanguageCache, LanguageDetector, BatchLanguageDetector, get_remote_detector
 
 class LanguageUpdater:
-    def __init__(self, csv_file):
+    def __init__(self, csv_file, remote='googletrans'):
         self.csv_file = csv_file
         self.df = pd.read_csv(csv_file)
         self.unknown_indices = self.df[(self.df['language'] == 'unknown') & (self.df['intent'] != 'No Intent')].index.tolist()
         self.current_index = 0
         self.languages = self.get_languages()
         self.translator = Translator()
-        self.language_cache = {}
+        self.language_cache = LanguageCache()
+        remote_detector = get_remote_detector(remote)
+        self.detector = LanguageDetector(remote=remote_detector, cache=self.language_cache)
+        self.batch_detector = BatchLanguageDetector(remote=remote_detector, cache=self.language_cache)
+        # Worker threads never touch Tk directly; they post events that the Tk loop drains.
+        self.ui_queue = queue.Queue()
 
         self.root = tk.Tk()
         self.root.title("Language Updater")
@@ -27,6 +28,7 @@ class LanguageUpdater:
         self.update_text()
         self.update_info()
 
+        self.root.after(100, self.process_ui_queue)
         self.root.mainloop()
 
     def get_languages(self):
@@ -97,27 +99,41 @@ class LanguageUpdater:
             self.text_widget.insert(tk.END, text)
 
             if text in self.language_cache:
-                self.language_var.set(self.language_cache[text])
-                self.radio_buttons[self.language_cache[text]].select()
-                self.progress_bar['value'] = self.current_index + 1
+                self.apply_language(self.language_cache.get(text))
             else:
-                threading.Thread(target=self.set_language_prediction, args=(text,)).start()
+                threading.Thread(target=self.set_language_prediction, args=(text,), daemon=True).start()
         else:
             messagebox.showinfo("Info", "All unknown languages have been updated.")
             self.save_and_exit()
 
     def set_language_prediction(self, text):
-        predicted_lang = self.predict_language(text)
-        self.language_cache[text] = predicted_lang
-        if predicted_lang in self.languages:
-            self.language_var.set(predicted_lang)
-            self.radio_buttons[predicted_lang].select()
-        else:
-            self.language_var.set('unknown')
-            self.radio_buttons['unknown'].select()
-        
+        self.ui_queue.put(('prediction', text, self.predict_language(text)))
+
+    def apply_language(self, language):
+        if language not in self.radio_buttons:
+            language = 'unknown'
+        self.language_var.set(language)
+        self.radio_buttons[language].select()
         self.progress_bar['value'] = self.current_index + 1
 
+    def process_ui_queue(self):
+        try:
+            while True:
+                event = self.ui_queue.get_nowait()
+                if event[0] == 'prediction':
+                    _, text, language = event
+                    if 0 <= self.current_index < len(self.unknown_indices) and self.df.at[self.unknown_indices[self.current_index], 'text'] == text:
+                        self.apply_language(language)
+                elif event[0] == 'progress':
+                    _, done, total = event
+                    self.progress_bar['maximum'] = max(total, 1)
+                    self.progress_bar['value'] = done
+                elif event[0] == 'auto_done':
+                    self.finish_auto_detect(event[1], event[2])
+        except queue.Empty:
+            pass
+        self.root.after(100, self.process_ui_queue)
+
     def update_info(self):
         remaining = len(self.unknown_indices) - self.current_index
         total = len(self.unknown_indices)
@@ -125,57 +141,7 @@ class LanguageUpdater:
         self.info_label.config(text=info_text)
 
     def predict_language(self, text):
-        def detect_languages(text):
-            predictions = []
-
-            try:
-                lang_code = detect(text)
-                predictions.append(lang_code)
-            except:
-                pass
-
-            try:
-                langid_code, _ = langid.classify(text)
-                predictions.append(langid_code)
-            except:
-                pass
-
-            try:
-                translated = self.translator.detect(text)
-                googletrans_code = translated.lang
-                predictions.append(googletrans_code)
-            except:
-                pass
-
-            return predictions
-
-        if text.isdigit() or re.match(r'^[a-zA-Z0-9]+$', text):
-            return 'unknown'
-
-        words = text.split()
-        phrases = [text[i:i+20] for i in range(0, len(text), 20)]
-
-        word_predictions = []
-        for word in words:
-            word_predictions.extend(detect_languages(word))
-
-        phrase_predictions = []
-        for phrase in phrases:
-            phrase_predictions.extend(detect_languages(phrase))
-
-        all_predictions = word_predictions + phrase_predictions
-        if all_predictions:
-            common_prediction = Counter(all_predictions).most_common(1)[0][0]
-            lang_map = {
-                'en': 'en',
-                'es': 'es',
-                'fr': 'fr',
-                'de': 'de',
-                'ru': 'ru'
-            }
-            return lang_map.get(common_prediction, 'unknown')
-        else:
-            return 'unknown'
+        return self.detector.detect(text)
 
     def translate_selected_text(self, event):
         try:
@@ -188,25 +154,38 @@ class LanguageUpdater:
 
     def start_auto_detect(self):
         self.auto_button.config(state=tk.DISABLED)
-        threading.Thread(target=self.auto_detect_languages).start()
+        threading.Thread(target=self.auto_detect_languages, daemon=True).start()
 
     def auto_detect_languages(self):
-        for idx, entry in enumerate(self.unknown_indices):
-            text = self.df.at[entry, 'text']
-            detected_language = self.predict_language(text)
-            self.df.at[entry, 'language'] = detected_language
-            self.language_cache[text] = detected_language
-            self.progress_bar['value'] = idx + 1
+        texts = [str(self.df.at[entry, 'text']) for entry in self.unknown_indices]
+        try:
+            languages = self.batch_detector.detect_many(texts, progress=lambda done, total: self.ui_queue.put(('progress', done, total)))
+            error = None
+        except Exception as e:
+            languages, error = None, e
+        # Dialogs must be shown from the Tk thread, so the outcome goes through the UI queue.
+        self.ui_queue.put(('auto_done', languages, error))
+
+    def finish_auto_detect(self, languages, error=None):
+        if languages is not None:
+            for entry, language in zip(self.unknown_indices, languages):
+                self.df.at[entry, 'language'] = language
+        # The bar tracked auto-detection; hand it back to the manual review of the unknown entries.
+        self.progress_bar['maximum'] = len(self.unknown_indices)
+        self.progress_bar['value'] = self.current_index
         self.update_text()
         self.update_info()
         self.auto_button.config(state=tk.NORMAL)
-        messagebox.showinfo("Info", "Auto-detection completed. Please review the entries manually.")
+        if error is not None:
+            messagebox.showerror("Error", f"Auto-detection failed: {error}")
+        else:
+            messagebox.showinfo("Info", "Auto-detection completed. Please review the entries manually.")
 
     def next_entry(self):
         if self.current_index < len(self.unknown_indices):
             idx = self.unknown_indices[self.current_index]
             self.df.at[idx, 'language'] = self.language_var.get()
-            self.language_cache[self.df.at[idx, 'text']] = self.language_var.get()
+            self.language_cache.set(self.df.at[idx, 'text'], self.language_var.get())
             self.current_index += 1
             if self.current_index < len(self.unknown_indices):
                 self.update_text()
@@ -222,7 +201,7 @@ class LanguageUpdater:
         if self.current_index > 0:
             idx = self.unknown_indices[self.current_index]
             self.df.at[idx, 'language'] = self.language_var.get()
-            self.language_cache[self.df.at[idx, 'text']] = self.language_var.get()
+            self.language_cache.set(self.df.at[idx, 'text'], self.language_var.get())
             self.current_index -= 1
             self.update_text()
             self.update_info()
@@ -231,6 +210,7 @@ class LanguageUpdater:
 
     def save_and_exit(self):
         self.df.to_csv(self.csv_file, index=False)
+        self.language_cache.save()
         self.root.destroy()
 
 if __name__ == "__main__":
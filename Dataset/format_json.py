@@ -1,97 +1,69 @@
+import argparse
 import json
-from googletrans import Translator, LANGUAGES
-import langid
-import re
-import time
-import random
-from collections import Counter
+import os
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
+from language_detection import LanguageCache, LanguageDetector, get_remote_detector, DEFAULT_CACHE_FILE
 
-translator = Translator()
-
-def retry_with_exponential_backoff(func, max_retries=5, initial_delay=1, backoff_factor=2, jitter=0.1):
-    def wrapper(*args, **kwargs):
-        delay = initial_delay
-        for attempt in range(max_retries):
-            try:
-                return func(*args, **kwargs)
-            except Exception as e:
-                print(f"Attempt {attempt + 1} failed: {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(delay + random.uniform(0, jitter))
-                    delay *= backoff_factor
-                else:
-                    print("Max retries reached. Skipping this request.")
-                    return None
-    return wrapper
-
-@retry_with_exponential_backoff
-def detect_with_googletrans(text):
-    translated = translator.detect(text)
-    return translated.lang
-
-def detect_languages(text):
-    predictions = []
-
-    # langid
-    try:
-        langid_code, _ = langid.classify(text)
-        predictions.append(langid_code)
-    except Exception as e:
-        print(f"langid failed: {e}")
-
-    # Google Translator
-    googletrans_code = detect_with_googletrans(text)
-    if googletrans_code:
-        predictions.append(googletrans_code)
-
-    return predictions
+_default_detector = None
 
 def predict_language(text):
-    # Handle pure numbers or random character sets as 'unknown'
-    if text.isdigit() or re.match(r'^[a-zA-Z0-9]+$', text):
-        return 'unknown'
-
-    # Detect languages
-    predictions = detect_languages(text)
-
-    # Aggregate predictions
-    if predictions:
-        common_prediction = Counter(predictions).most_common(1)[0][0]
-        lang_map = {
-            'en': 'en',
-            'es': 'es',
-            'fr': 'fr',
-            'de': 'de',
-            'ru': 'ru'
-        }
-        return lang_map.get(common_prediction, 'unknown')
-    else:
-        return 'unknown'
-
-def add_language_prefix(json_file, output_file):
+    global _default_detector
+    if _default_detector is None:
+        _default_detector = LanguageDetector(remote=get_remote_detector('googletrans'))
+    return _default_detector.detect(text)
+
+def load_checkpoint(checkpoint_file):
+    if checkpoint_file and os.path.exists(checkpoint_file):
+        with open(checkpoint_file, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    return {}
+
+def save_checkpoint(checkpoint_file, updated_phrases):
+    tmp_path = checkpoint_file + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(updated_phrases, file, ensure_ascii=False)
+    os.replace(tmp_path, checkpoint_file)
+
+def add_language_prefix(json_file, output_file, remote='googletrans', workers=8, cache_file=DEFAULT_CACHE_FILE, checkpoint_file=None):
     print(f"Loading phrases from {json_file}")
     with open(json_file, 'r', encoding='utf-8') as file:
         phrases = json.load(file)["phrases"]
 
-    updated_phrases = {}
+    checkpoint_file = checkpoint_file or output_file + '.partial'
+    updated_phrases = load_checkpoint(checkpoint_file)
+    if updated_phrases:
+        print(f"Resuming from {checkpoint_file}: {len(updated_phrases)} intents already done")
+
+    cache = LanguageCache(cache_file)
+    detector = LanguageDetector(remote=get_remote_detector(remote), cache=cache)
 
     print("Processing intents and texts")
-    for intent, texts in tqdm(phrases.items(), desc="Intents"):
-        updated_texts = []
-        for text in tqdm(texts, desc=f"Texts for intent '{intent}'", leave=False):
-            language = predict_language(text)
-            prefix = f"{language}:"
-            updated_texts.append(f"{prefix}{text}")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for intent, texts in tqdm(phrases.items(), desc="Intents"):
+            if intent in updated_phrases:
+                continue
+
+            languages = list(tqdm(executor.map(detector.detect, texts), total=len(texts), desc=f"Texts for intent '{intent}'", leave=False))
+            updated_phrases[intent] = [f"{language}:{text}" for text, language in zip(texts, languages)]
 
-        updated_phrases[intent] = updated_texts
+            cache.save()
+            save_checkpoint(checkpoint_file, updated_phrases)
 
+    print(f"Remote detector calls: {detector.remote_calls}")
     print(f"Writing updated phrases to {output_file}")
     with open(output_file, 'w', encoding='utf-8') as file:
-        json.dump({"phrases": updated_phrases}, file, ensure_ascii=False, indent=4)
+        json.dump({"phrases": {intent: updated_phrases[intent] for intent in phrases}}, file, ensure_ascii=False, indent=4)
+    os.remove(checkpoint_file)
     print("Update complete")
 
 if __name__ == "__main__":
-    input_json = "./Resources/_dataset.assets/phrase.json"
-    output_json = "./Resources/_dataset.assets/updated_phrase.json"
-    add_language_prefix(input_json, output_json)
+    parser = argparse.ArgumentParser(description="Prefix every phrase with its detected language.")
+    parser.add_argument('--input', default="./Resources/_dataset.assets/phrase.json")
+    parser.add_argument('--output', default="./Resources/_dataset.assets/updated_phrase.json")
+    parser.add_argument('--remote', default='googletrans', help="Remote detector used when local detectors disagree: googletrans, stub or none")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--cache-file', default=DEFAULT_CACHE_FILE)
+    args = parser.parse_args()
+
+    add_language_prefix(args.input, args.output, remote=args.remote, workers=args.workers, cache_file=args.cache_file)
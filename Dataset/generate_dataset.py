@@ -1,9 +1,11 @@
 import pandas as pd
+import argparse
 import json
+import os
 import random
 import string
 
-def generate_random_noise():
+def generate_random_noise(rng=random):
     noise_types = [
         random_lorem_ipsum,
         random_gibberish,
@@ -11,9 +13,9 @@ def generate_random_noise():
         # random_special_characters,
         random_numbers
     ]
-    return random.choice(noise_types)()
+    return rng.choice(noise_types)(rng)
 
-def random_lorem_ipsum():
+def random_lorem_ipsum(rng=random):
     lorem_ipsum_texts = [
         "Lorem ipsum dolor sit amet, consectetur adipiscing elit.",
         "Sed do eiusmod tempor incididunt ut labore et dolore magna aliqua.",
@@ -21,12 +23,12 @@ def random_lorem_ipsum():
         "Duis aute irure dolor in reprehenderit in voluptate velit esse cillum dolore eu fugiat nulla pariatur.",
         "Excepteur sint occaecat cupidatat non proident, sunt in culpa qui officia deserunt mollit anim id est laborum."
     ]
-    return random.choice(lorem_ipsum_texts)
+    return rng.choice(lorem_ipsum_texts)
 
-def random_gibberish():
-    return ''.join(random.choices(string.ascii_letters + string.digits, k=random.randint(20, 100)))
+def random_gibberish(rng=random):
+    return ''.join(rng.choices(string.ascii_letters + string.digits, k=rng.randint(20, 100)))
 
-def random_common_phrases():
+def random_common_phrases(rng=random):
     common_phrases = [
         "The quick brown fox jumps over the lazy dog.",
         "How much wood would a woodchuck chuck if a woodchuck could chuck wood?",
@@ -34,16 +36,16 @@ def random_common_phrases():
         "To be or not to be, that is the question.",
         "All work and no play makes Jack a dull boy."
     ]
-    return random.choice(common_phrases)
+    return rng.choice(common_phrases)
 
-def random_special_characters():
-    special_chars = ''.join(random.choices(string.punctuation + string.whitespace, k=random.randint(20, 100)))
+def random_special_characters(rng=random):
+    special_chars = ''.join(rng.choices(string.punctuation + string.whitespace, k=rng.randint(20, 100)))
     return special_chars.strip()
 
-def random_numbers():
-    return ''.join(random.choices(string.digits, k=random.randint(5, 20)))
+def random_numbers(rng=random):
+    return ''.join(rng.choices(string.digits, k=rng.randint(5, 20)))
 
-def generate_dataset(json_file, output_csv, num_samples=5000, noise_fraction=0.1):
+def load_phrase_rows(json_file):
     with open(json_file, 'r', encoding='utf-8') as file:
         phrases = json.load(file)["phrases"]
 
@@ -62,6 +64,10 @@ def generate_dataset(json_file, output_csv, num_samples=5000, noise_fraction=0.1
                 data.append((text[3:], intent, "ru"))
             else:
                 data.append((text, intent, "unknown"))
+    return data
+
+def generate_dataset(json_file, output_csv, num_samples=5000, noise_fraction=0.1):
+    data = load_phrase_rows(json_file)
 
     df = pd.DataFrame(data, columns=["text", "intent", "language"])
 
@@ -93,7 +99,97 @@ def generate_dataset(json_file, output_csv, num_samples=5000, noise_fraction=0.1
     df = df.sample(n=num_samples).reset_index(drop=True)
     df.to_csv(output_csv, index=False)
 
+def stream_dataset(json_file, num_samples=5000, noise_fraction=0.1, intent_weights=None, shuffle_buffer_size=10000, seed=None):
+    rng = random.Random(seed)
+    rows_by_intent = {}
+    for row in load_phrase_rows(json_file):
+        rows_by_intent.setdefault(row[1], []).append(row)
+
+    # Balancing is done by how often each intent is drawn instead of by duplicating its rows;
+    # equal weights reproduce the oversampled class balance of generate_dataset.
+    intents = list(rows_by_intent)
+    weights = [(intent_weights or {}).get(intent, 1.0) for intent in intents]
+    orders = {intent: [] for intent in intents}
+
+    def next_row(intent):
+        # Each intent walks a fresh permutation of its phrases before any phrase repeats.
+        if not orders[intent]:
+            orders[intent] = list(range(len(rows_by_intent[intent])))
+            rng.shuffle(orders[intent])
+        return rows_by_intent[intent][orders[intent].pop()]
+
+    def sample_row():
+        if rng.random() < noise_fraction:
+            return (generate_random_noise(rng), "No Intent", "unknown")
+        return next_row(rng.choices(intents, weights=weights)[0])
+
+    buffer = []
+    for _ in range(num_samples):
+        row = sample_row()
+        if len(buffer) < shuffle_buffer_size:
+            buffer.append(row)
+            continue
+        idx = rng.randrange(shuffle_buffer_size)
+        yield buffer[idx]
+        buffer[idx] = row
+
+    rng.shuffle(buffer)
+    yield from buffer
+
+def write_dataset_chunks(rows, output_path, chunk_size=100000, file_format='csv'):
+    # CSV output is appended to a single file; Parquet output is a directory of part-NNNNN shards.
+    if file_format == 'parquet':
+        os.makedirs(output_path, exist_ok=True)
+        # Parts left by a previous, larger run would otherwise be read back together with the new ones.
+        for name in os.listdir(output_path):
+            if name.startswith('part-') and name.endswith('.parquet'):
+                os.remove(os.path.join(output_path, name))
+    elif os.path.exists(output_path):
+        os.remove(output_path)
+
+    chunk = []
+    written = 0
+    shard = 0
+
+    def flush(chunk, shard):
+        df = pd.DataFrame(chunk, columns=["text", "intent", "language"])
+        if file_format == 'parquet':
+            df.to_parquet(os.path.join(output_path, f"part-{shard:05d}.parquet"), index=False)
+        else:
+            df.to_csv(output_path, mode='a', header=shard == 0, index=False)
+
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            flush(chunk, shard)
+            written += len(chunk)
+            shard += 1
+            chunk = []
+    if chunk:
+        flush(chunk, shard)
+        written += len(chunk)
+    return written
+
+def generate_dataset_streaming(json_file, output_path, num_samples=5000, noise_fraction=0.1, chunk_size=100000, file_format='csv', shuffle_buffer_size=10000, seed=None):
+    rows = stream_dataset(json_file, num_samples=num_samples, noise_fraction=noise_fraction, shuffle_buffer_size=shuffle_buffer_size, seed=seed)
+    return write_dataset_chunks(rows, output_path, chunk_size=chunk_size, file_format=file_format)
+
 if __name__ == "__main__":
-    json_file = r"./Resources/_dataset.assets/updated_phrase.json"
-    output_csv = "./Resources/_dataset/dataset.csv"
-    generate_dataset(json_file, output_csv, num_samples=5000)
+    parser = argparse.ArgumentParser(description="Generate the intent dataset from the language-prefixed phrases.")
+    parser.add_argument('--json-file', default=r"./Resources/_dataset.assets/updated_phrase.json")
+    parser.add_argument('--output', default="./Resources/_dataset/dataset.csv")
+    parser.add_argument('--num-samples', type=int, default=5000)
+    parser.add_argument('--noise-fraction', type=float, default=0.1)
+    parser.add_argument('--stream', action='store_true', help="Generate rows lazily and write them in chunks with bounded memory")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv', help="Streaming output format; parquet writes a directory of shards")
+    parser.add_argument('--chunk-size', type=int, default=100000)
+    parser.add_argument('--shuffle-buffer', type=int, default=10000)
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    if args.stream:
+        written = generate_dataset_streaming(args.json_file, args.output, num_samples=args.num_samples, noise_fraction=args.noise_fraction,
+                                             chunk_size=args.chunk_size, file_format=args.format, shuffle_buffer_size=args.shuffle_buffer, seed=args.seed)
+        print(f"Wrote {written} rows to {args.output}")
+    else:
+        generate_dataset(args.json_file, args.output, num_samples=args.num_samples, noise_fraction=args.noise_fraction)
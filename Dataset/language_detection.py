@@ -0,0 +1,229 @@
+import json
+import multiprocessing
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from langdetect import detect, DetectorFactory
+from langdetect.lang_detect_exception import LangDetectException
+import langid
+
+DetectorFactory.seed = 0
+
+SUPPORTED_LANGUAGES = ('en', 'es', 'fr', 'de', 'ru')
+DEFAULT_CACHE_FILE = "./Resources/_dataset.assets/language_cache.json"
+
+def retry_with_exponential_backoff(func, max_retries=5, initial_delay=1, backoff_factor=2, jitter=0.1):
+    def wrapper(*args, **kwargs):
+        delay = initial_delay
+        for attempt in range(max_retries):
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                print(f"Attempt {attempt + 1} failed: {e}")
+                if attempt < max_retries - 1:
+                    time.sleep(delay + random.uniform(0, jitter))
+                    delay *= backoff_factor
+                else:
+                    print("Max retries reached. Skipping this request.")
+                    return None
+    return wrapper
+
+def is_unlabelable(text):
+    # Pure numbers or random character sets are 'unknown'.
+    return text.isdigit() or re.match(r'^[a-zA-Z0-9]+$', text) is not None
+
+def local_predictions(text):
+    predictions = []
+    try:
+        langid_code, _ = langid.classify(text)
+        predictions.append(langid_code)
+    except Exception as e:
+        print(f"langid failed: {e}")
+    try:
+        predictions.append(detect(text))
+    except LangDetectException:
+        pass
+    return predictions
+
+def vote(predictions):
+    if not predictions:
+        return 'unknown'
+    common_prediction = Counter(predictions).most_common(1)[0][0]
+    return common_prediction if common_prediction in SUPPORTED_LANGUAGES else 'unknown'
+
+def is_ambiguous(predictions):
+    return len(set(predictions)) != 1 or predictions[0] not in SUPPORTED_LANGUAGES
+
+class GoogleTransDetector:
+    def __init__(self, max_retries=5):
+        from googletrans import Translator
+        self.translator = Translator()
+        self.detect = retry_with_exponential_backoff(self._detect, max_retries=max_retries)
+
+    def _detect(self, text):
+        return self.translator.detect(text).lang
+
+class StubDetector:
+    # Offline stand-in for the remote detector: abstains, so local detectors decide alone.
+    def __init__(self, language=None):
+        self.language = language
+
+    def detect(self, text):
+        return self.language
+
+REMOTE_DETECTORS = {
+    'googletrans': GoogleTransDetector,
+    'stub': StubDetector,
+}
+
+def get_remote_detector(name):
+    if name in (None, 'none'):
+        return None
+    if name not in REMOTE_DETECTORS:
+        raise ValueError(f"Unknown remote detector '{name}', expected one of {sorted(REMOTE_DETECTORS)} or 'none'")
+    return REMOTE_DETECTORS[name]()
+
+class LanguageCache:
+    def __init__(self, cache_file=DEFAULT_CACHE_FILE):
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._dirty = False
+        if cache_file and os.path.exists(cache_file):
+            with open(cache_file, 'r', encoding='utf-8') as file:
+                self._entries = json.load(file)
+
+    def get(self, text):
+        with self._lock:
+            return self._entries.get(text)
+
+    def set(self, text, language):
+        with self._lock:
+            if self._entries.get(text) != language:
+                self._entries[text] = language
+                self._dirty = True
+
+    def update(self, entries):
+        for text, language in entries.items():
+            self.set(text, language)
+
+    def __contains__(self, text):
+        with self._lock:
+            return text in self._entries
+
+    def save(self):
+        if not self.cache_file:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = dict(self._entries)
+            self._dirty = False
+        os.makedirs(os.path.dirname(self.cache_file) or '.', exist_ok=True)
+        tmp_path = self.cache_file + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(entries, file, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_file)
+
+class LanguageDetector:
+    def __init__(self, remote=None, cache=None):
+        self.remote = remote
+        self.cache = cache if cache is not None else LanguageCache(None)
+        self.remote_calls = 0
+
+    def detect(self, text):
+        cached = self.cache.get(text)
+        if cached is not None:
+            return cached
+
+        if is_unlabelable(text):
+            language = 'unknown'
+        else:
+            predictions = local_predictions(text)
+            # The remote detector is only consulted when the local ones disagree or abstain.
+            if self.remote is not None and is_ambiguous(predictions):
+                self.remote_calls += 1
+                remote_language = self.remote.detect(text)
+                if remote_language:
+                    predictions.append(remote_language)
+            language = vote(predictions)
+
+        self.cache.set(text, language)
+        return language
+
+def local_predictions_chunk(texts):
+    DetectorFactory.seed = 0
+    return [None if is_unlabelable(text) else local_predictions(text) for text in texts]
+
+class BatchLanguageDetector:
+    def __init__(self, remote=None, cache=None, chunk_size=256, workers=None, remote_workers=8):
+        self.remote = remote
+        self.cache = cache if cache is not None else LanguageCache()
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.remote_workers = remote_workers
+        self.remote_calls = 0
+
+    def detect_many(self, texts, progress=None):
+        texts = [str(text) for text in texts]
+        pending = [text for text in dict.fromkeys(texts) if text not in self.cache]
+        total = len(pending)
+        if progress:
+            progress(0, total)
+
+        predictions = []
+        if pending:
+            chunks = [pending[i:i + self.chunk_size] for i in range(0, total, self.chunk_size)]
+            # spawn keeps the workers clear of any Tk state in the parent process.
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+                for chunk_predictions in executor.map(local_predictions_chunk, chunks):
+                    predictions.extend(chunk_predictions)
+                    if progress:
+                        progress(len(predictions), total)
+
+        # Only texts the local detectors cannot agree on are escalated to the remote detector.
+        ambiguous = [idx for idx, local in enumerate(predictions) if local is not None and is_ambiguous(local)]
+        if self.remote is not None and ambiguous:
+            self.remote_calls += len(ambiguous)
+            with ThreadPoolExecutor(max_workers=self.remote_workers) as executor:
+                remote_languages = list(executor.map(self.remote.detect, [pending[idx] for idx in ambiguous]))
+            for idx, remote_language in zip(ambiguous, remote_languages):
+                if remote_language:
+                    predictions[idx] = predictions[idx] + [remote_language]
+
+        self.cache.update({text: vote(local or []) for text, local in zip(pending, predictions)})
+        self.cache.save()
+        return [self.cache.get(text) for text in texts]
+
+def relabel_csv(csv_file, output_file=None, remote='none', only_unknown=True, workers=None):
+    import pandas as pd
+
+    df = pd.read_csv(csv_file)
+    if only_unknown and 'language' in df.columns:
+        mask = (df['language'] == 'unknown') & (df['intent'] != 'No Intent')
+    else:
+        mask = pd.Series(True, index=df.index)
+
+    detector = BatchLanguageDetector(remote=get_remote_detector(remote), workers=workers)
+    start = time.perf_counter()
+    df.loc[mask, 'language'] = detector.detect_many(df.loc[mask, 'text'].tolist(),
+                                                    progress=lambda done, total: print(f"\rDetected {done}/{total}", end='', flush=True))
+    print(f"\nRelabeled {int(mask.sum())} rows in {time.perf_counter() - start:.1f}s ({detector.remote_calls} remote calls)")
+    df.to_csv(output_file or csv_file, index=False)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Batch-detect the language column of a dataset CSV.")
+    parser.add_argument('csv_file', nargs='?', default="./Resources/_dataset/dataset.csv")
+    parser.add_argument('--output')
+    parser.add_argument('--remote', default='none', help="Remote detector for ambiguous texts: googletrans, stub or none")
+    parser.add_argument('--all-rows', action='store_true', help="Relabel every row, not only the 'unknown' ones")
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args()
+
+    relabel_csv(args.csv_file, args.output, remote=args.remote, only_unknown=not args.all_rows, workers=args.workers)
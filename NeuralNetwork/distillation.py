@@ -0,0 +1,134 @@
+import argparse
+import copy
+import json
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from torch.utils.data import DataLoader
+from transformers import Trainer
+from NeuralNetwork.metrics import StreamingMetrics
+
+DISTILLATION_REPORT_FILE = 'distillation_report.json'
+
+def select_layers(num_teacher_layers, num_student_layers):
+    # Evenly spaced teacher layers, always keeping the last one, e.g. 12 -> 3 gives [3, 7, 11].
+    step = num_teacher_layers / num_student_layers
+    return [int(round(step * (i + 1))) - 1 for i in range(num_student_layers)]
+
+def build_student(teacher_model, num_layers=3):
+    config = copy.deepcopy(teacher_model.config)
+    layer_ids = select_layers(config.num_hidden_layers, num_layers)
+    config.num_hidden_layers = num_layers
+    student = type(teacher_model)(config)
+
+    # Initialising from a subset of teacher layers converges much faster than training from scratch.
+    teacher_base = getattr(teacher_model, teacher_model.base_model_prefix)
+    student_base = getattr(student, student.base_model_prefix)
+    student_base.embeddings.load_state_dict(teacher_base.embeddings.state_dict())
+    for student_layer, teacher_layer_id in zip(student_base.encoder.layer, layer_ids):
+        student_layer.load_state_dict(teacher_base.encoder.layer[teacher_layer_id].state_dict())
+    student.classifier.load_state_dict(teacher_model.classifier.state_dict())
+    return student
+
+def count_parameters(model):
+    return sum(parameter.numel() for parameter in model.parameters())
+
+class DistillationTrainer(Trainer):
+    def __init__(self, *args, teacher_model, temperature=2.0, alpha=0.5, **kwargs):
+        if teacher_model is None:
+            raise ValueError("DistillationTrainer needs a teacher_model to distill from")
+        super().__init__(*args, **kwargs)
+        self.teacher_model = teacher_model.to(self.args.device)
+        self.teacher_model.eval()
+        self.temperature = temperature
+        self.alpha = alpha
+
+    def compute_loss(self, model, inputs, return_outputs=False, **kwargs):
+        outputs = model(**inputs)
+        with torch.no_grad():
+            teacher_logits = self.teacher_model(**{k: v for k, v in inputs.items() if k != 'labels'}).logits
+
+        # Hinton et al.: KL between temperature-softened distributions, scaled by T^2 to keep gradient magnitudes comparable.
+        soft_loss = F.kl_div(
+            F.log_softmax(outputs.logits / self.temperature, dim=-1),
+            F.softmax(teacher_logits / self.temperature, dim=-1),
+            reduction='batchmean',
+        ) * self.temperature ** 2
+        loss = self.alpha * soft_loss + (1 - self.alpha) * outputs.loss
+        return (loss, outputs) if return_outputs else loss
+
+def measure_model(model, dataset, data_collator, device, batch_size=32, latency_samples=200, warmup=10):
+    model.to(device)
+    model.eval()
+    metrics = StreamingMetrics(model.config.num_labels)
+    with torch.no_grad():
+        for batch in DataLoader(dataset, batch_size=batch_size, shuffle=False, collate_fn=data_collator):
+            labels = batch.pop('labels')
+            metrics.update(model(**{k: v.to(device) for k, v in batch.items()}).logits, labels)
+
+        # Single-utterance latency is what a chat message pays.
+        latencies = []
+        for idx in range(min(len(dataset), warmup + latency_samples)):
+            item = {k: v for k, v in data_collator([dataset[idx]]).items() if k != 'labels'}
+            item = {k: v.to(device) for k, v in item.items()}
+            start = time.perf_counter()
+            model(**item)
+            if device.type == 'cuda':
+                torch.cuda.synchronize()
+            if idx >= warmup:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    results = metrics.compute()
+    return {
+        'accuracy': results['accuracy'],
+        'f1': results['f1'],
+        'parameters': count_parameters(model),
+        'latency_ms_p50': float(np.percentile(latencies, 50)) if latencies else None,
+        'latency_ms_p95': float(np.percentile(latencies, 95)) if latencies else None,
+    }
+
+def compare_models(teacher_model, student_model, dataset, data_collator, device):
+    report = {
+        'teacher': measure_model(teacher_model, dataset, data_collator, device),
+        'student': measure_model(student_model, dataset, data_collator, device),
+    }
+    teacher, student = report['teacher'], report['student']
+    report['accuracy_drop'] = teacher['accuracy'] - student['accuracy']
+    report['parameter_ratio'] = student['parameters'] / teacher['parameters']
+    if teacher['latency_ms_p50'] and student['latency_ms_p50']:
+        report['speedup_p50'] = teacher['latency_ms_p50'] / student['latency_ms_p50']
+    return report
+
+def save_report(report, output_dir):
+    report_path = os.path.join(output_dir, DISTILLATION_REPORT_FILE)
+    with open(report_path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=4)
+    print(f"Distillation report saved to {report_path}")
+    return report_path
+
+if __name__ == "__main__":
+    from NeuralNetwork.model import IntentRecognizer, IntentDataset, load_label_map
+    from Preprocessing.data_preprocessing import DataPreprocessor
+    from DB.database import fetch_feedback
+
+    parser = argparse.ArgumentParser(description="Distil a fine-tuned teacher checkpoint into a smaller student.")
+    parser.add_argument('--teacher-dir', default='./model')
+    parser.add_argument('--dataset', default='./Dataset/Resources/_dataset/dataset.csv')
+    parser.add_argument('--output-dir', default='./student')
+    parser.add_argument('--layers', type=int, default=3)
+    parser.add_argument('--temperature', type=float, default=2.0)
+    parser.add_argument('--alpha', type=float, default=0.5, help="Weight of the soft teacher loss against the hard-label loss")
+    parser.add_argument('--epochs', type=int, default=4)
+    args = parser.parse_args()
+
+    label_to_id = load_label_map(args.teacher_dir)
+    recognizer = IntentRecognizer(num_labels=len(label_to_id), model_name=args.teacher_dir, temperature=args.temperature, label_to_id=label_to_id)
+    train_encodings, val_encodings, train_labels, val_labels, _ = DataPreprocessor(tokenizer_name=args.teacher_dir).prepare_data(
+        file_path=args.dataset, feedback_data=fetch_feedback(), label_to_id=label_to_id)
+    recognizer.distill(IntentDataset(train_encodings, train_labels), IntentDataset(val_encodings, val_labels),
+                       output_dir=args.output_dir, num_student_layers=args.layers, alpha=args.alpha, num_train_epochs=args.epochs)
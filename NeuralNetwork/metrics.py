@@ -0,0 +1,91 @@
+import numpy as np
+
+def to_numpy(values):
+    if hasattr(values, 'detach'):
+        values = values.detach().float().cpu().numpy() if values.is_floating_point() else values.detach().cpu().numpy()
+    return np.asarray(values)
+
+def softmax(logits):
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+class StreamingMetrics:
+    def __init__(self, num_classes=None, num_bins=1000):
+        self.num_classes = num_classes
+        self.num_bins = num_bins
+        self.confusion_matrix = None
+        self.score_histograms = None
+        if num_classes is not None:
+            self.reset()
+
+    def reset(self):
+        # Memory is O(num_classes^2) for the confusion matrix plus O(num_classes * num_bins) for ROC-AUC,
+        # independent of how many examples are evaluated.
+        self.confusion_matrix = np.zeros((self.num_classes, self.num_classes), dtype=np.int64)
+        self.score_histograms = np.zeros((self.num_classes, 2, self.num_bins), dtype=np.int64)
+
+    def update(self, logits, labels):
+        logits = to_numpy(logits).astype(np.float64)
+        labels = to_numpy(labels).astype(np.int64).ravel()
+        if logits.ndim == 1:
+            logits = logits[:, None]
+        if self.num_classes is None:
+            self.num_classes = logits.shape[1]
+            self.reset()
+
+        num_classes = self.num_classes
+        probs = softmax(logits)
+        preds = probs.argmax(axis=1)
+        self.confusion_matrix += np.bincount(labels * num_classes + preds, minlength=num_classes ** 2).reshape(num_classes, num_classes)
+
+        # One histogram of predicted probability per class, split by whether the example belongs to it.
+        bins = np.minimum((probs * self.num_bins).astype(np.int64), self.num_bins - 1)
+        is_positive = (labels[:, None] == np.arange(num_classes)[None, :]).astype(np.int64)
+        flat_index = (np.arange(num_classes)[None, :] * 2 + is_positive) * self.num_bins + bins
+        self.score_histograms += np.bincount(flat_index.ravel(), minlength=num_classes * 2 * self.num_bins).reshape(num_classes, 2, self.num_bins)
+
+    def approx_roc_auc(self):
+        # Scores are bucketed into num_bins, so pairs landing in the same bin count as ties; the result can differ
+        # from sklearn's exact roc_auc_score by up to about 1 / num_bins.
+        negatives = self.score_histograms[:, 0, :].astype(np.float64)
+        positives = self.score_histograms[:, 1, :].astype(np.float64)
+        num_negatives = negatives.sum(axis=1)
+        num_positives = positives.sum(axis=1)
+        if np.any(num_negatives == 0) or np.any(num_positives == 0):
+            return None
+
+        # P(score_pos > score_neg) + 0.5 * P(tie), with ties meaning the same probability bin.
+        negatives_below = np.cumsum(negatives, axis=1) - negatives
+        wins = (positives * (negatives_below + 0.5 * negatives)).sum(axis=1)
+        return float(np.mean(wins / (num_positives * num_negatives)))
+
+    def compute(self):
+        confusion = self.confusion_matrix.astype(np.float64)
+        total = confusion.sum()
+        true_positives = np.diag(confusion)
+        support = confusion.sum(axis=1)
+        predicted = confusion.sum(axis=0)
+
+        # zero_division=1, matching the sklearn settings used before.
+        precision = np.divide(true_positives, predicted, out=np.ones_like(true_positives), where=predicted > 0)
+        recall = np.divide(true_positives, support, out=np.ones_like(true_positives), where=support > 0)
+        f1_denominator = support + predicted
+        f1 = np.divide(2 * true_positives, f1_denominator, out=np.ones_like(true_positives), where=f1_denominator > 0)
+        weights = support / total if total else support
+
+        correct = true_positives.sum()
+        mcc_denominator = np.sqrt((total ** 2 - predicted @ predicted) * (total ** 2 - support @ support))
+        mcc = (correct * total - support @ predicted) / mcc_denominator if mcc_denominator > 0 else 0.0
+
+        metrics = {
+            'accuracy': float(correct / total) if total else 0.0,
+            'precision': float(weights @ precision),
+            'recall': float(weights @ recall),
+            'f1': float(weights @ f1),
+            'mcc': float(mcc),
+        }
+        roc_auc = self.approx_roc_auc()
+        if roc_auc is not None:
+            metrics['roc_auc_approx'] = roc_auc
+        return metrics
@@ -1,11 +1,61 @@
 import torch
 from torch.utils.data import DataLoader, Dataset
-from transformers import Trainer, TrainingArguments, XLMRobertaForSequenceClassification, XLMRobertaTokenizer
-from sklearn.metrics import accuracy_score, precision_recall_fscore_support, confusion_matrix, roc_auc_score, matthews_corrcoef
+from transformers import Trainer, TrainingArguments, EarlyStoppingCallback, XLMRobertaForSequenceClassification, DataCollatorWithPadding
 from safetensors.torch import load_file as load_safetensors
 import numpy as np
 import os
+import json
+import hashlib
+import threading
 import torch.nn.functional as F
+from NeuralNetwork.metrics import StreamingMetrics
+from Serving.backends import TorchBackend, load_backend, set_torch_threads
+from Preprocessing.tokenization import load_tokenizer
+
+LABEL_MAP_FILE = 'label_map.json'
+VAL_SPLIT_FILE = 'val_split.csv'
+CHECKPOINT_FILES = ('config.json', 'model.safetensors', 'pytorch_model.bin', 'model_int8.pt', 'tokenizer.json', 'sentencepiece.bpe.model', LABEL_MAP_FILE, 'utterance_index.json')
+
+def checkpoint_version(model_dir):
+    # Cheap fingerprint of the files that define a checkpoint; it changes whenever any of them is rewritten.
+    digest = hashlib.sha1()
+    for name in CHECKPOINT_FILES:
+        path = os.path.join(model_dir, name)
+        if os.path.exists(path):
+            stat = os.stat(path)
+            digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns};".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def save_label_map(label_to_id, save_directory):
+    os.makedirs(save_directory, exist_ok=True)
+    with open(os.path.join(save_directory, LABEL_MAP_FILE), 'w', encoding='utf-8') as file:
+        json.dump({label: int(idx) for label, idx in label_to_id.items()}, file, ensure_ascii=False, indent=4)
+
+def load_label_map(model_dir):
+    label_map_path = os.path.join(model_dir, LABEL_MAP_FILE)
+    if not os.path.exists(label_map_path):
+        return None
+    with open(label_map_path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def set_dropout(model, enabled):
+    # Switches only the dropout layers, so everything else keeps its eval-mode behaviour during MC-dropout.
+    for module in model.modules():
+        if isinstance(module, torch.nn.Dropout):
+            module.train(enabled)
+
+def save_val_split(val_df, save_directory):
+    # The held-out rows of the run that produced the checkpoint, so later checks never score rows it was trained on.
+    os.makedirs(save_directory, exist_ok=True)
+    val_df[['text', 'intent']].to_csv(os.path.join(save_directory, VAL_SPLIT_FILE), index=False)
+
+def load_val_split(model_dir):
+    import pandas as pd
+
+    val_split_path = os.path.join(model_dir, VAL_SPLIT_FILE)
+    if not os.path.exists(val_split_path):
+        return None
+    return pd.read_csv(val_split_path, keep_default_na=False)
 
 class IntentDataset(Dataset):
     def __init__(self, encodings, labels):
@@ -20,76 +70,120 @@ class IntentDataset(Dataset):
     def __len__(self):
         return len(self.labels)
 
+class MemmapIntentDataset(Dataset):
+    def __init__(self, data_dir, shards=None):
+        from Preprocessing.sharded_dataset import read_shard_meta
+        meta = read_shard_meta(data_dir)
+        selected = [(name, size) for name, size in zip(meta['shards'], meta['shard_sizes']) if shards is None or name in shards]
+        self.data_dir = data_dir
+        self.languages = meta['languages']
+        self.shard_dirs = [os.path.join(data_dir, name) for name, _ in selected]
+        self.cumulative_sizes = np.cumsum([size for _, size in selected])
+        self._arrays = None
+
+    def _open(self):
+        # Copy-on-write maps give writable arrays, so torch.from_numpy can view them without copying.
+        self._arrays = [
+            {name: np.load(os.path.join(shard_dir, f"{name}.npy"), mmap_mode='c') for name in ('input_ids', 'offsets', 'labels', 'languages')}
+            for shard_dir in self.shard_dirs
+        ]
+
+    def __getstate__(self):
+        # DataLoader workers receive only the paths and map the shards themselves.
+        state = self.__dict__.copy()
+        state['_arrays'] = None
+        return state
+
+    def locate(self, idx):
+        shard = int(np.searchsorted(self.cumulative_sizes, idx, side='right'))
+        local_idx = idx - (self.cumulative_sizes[shard - 1] if shard else 0)
+        return shard, int(local_idx)
+
+    def __getitem__(self, idx):
+        if self._arrays is None:
+            self._open()
+        shard, local_idx = self.locate(idx)
+        arrays = self._arrays[shard]
+        start, end = arrays['offsets'][local_idx], arrays['offsets'][local_idx + 1]
+        input_ids = torch.from_numpy(arrays['input_ids'][start:end])
+        return {
+            'input_ids': input_ids,
+            'attention_mask': torch.ones_like(input_ids),
+            'labels': torch.tensor(arrays['labels'][local_idx], dtype=torch.long),
+        }
+
+    def language(self, idx):
+        if self._arrays is None:
+            self._open()
+        shard, local_idx = self.locate(idx)
+        return self.languages[self._arrays[shard]['languages'][local_idx]]
+
+    def __len__(self):
+        return int(self.cumulative_sizes[-1]) if len(self.cumulative_sizes) else 0
+
 class IntentRecognizer:
-    def __init__(self, num_labels, model_name='xlm-roberta-base', temperature=1.0, num_mc_samples=10):
+    def __init__(self, num_labels, model_name='xlm-roberta-base', temperature=1.0, num_mc_samples=10, label_to_id=None):
+        self.label_to_id = label_to_id
         self.device = torch.device('cuda') if torch.cuda.is_available() else torch.device('cpu')
         self.model_name = model_name
         self.model = XLMRobertaForSequenceClassification.from_pretrained(model_name, num_labels=num_labels).to(self.device)
-        self.tokenizer = XLMRobertaTokenizer.from_pretrained(model_name)
+        self.backend = TorchBackend(self.model, self.device)
+        self.tokenizer = load_tokenizer(model_name)
+        self.data_collator = DataCollatorWithPadding(self.tokenizer)
         self.temperature = temperature
         self.num_mc_samples = num_mc_samples
+        self.eval_metrics = StreamingMetrics(num_labels)
+        self.last_confusion_matrix = None
+        # Dropout is toggled on the shared model for MC-dropout, so every forward pass through it holds this lock.
+        self._model_lock = threading.Lock()
 
-    def compute_metrics(self, pred):
-        labels = pred.label_ids
-        preds = pred.predictions.argmax(-1)
-        probs = pred.predictions
-
-        accuracy = accuracy_score(labels, preds)
-        precision, recall, f1, _ = precision_recall_fscore_support(labels, preds, average='weighted', zero_division=1)
-        conf_matrix = confusion_matrix(labels, preds)
-        mcc = matthews_corrcoef(labels, preds)
+    def compute_metrics(self, pred, compute_result=True):
+        # With batch_eval_metrics the Trainer calls this once per eval batch and sets compute_result on the last one.
+        self.eval_metrics.update(pred.predictions, pred.label_ids)
+        if not compute_result:
+            return {}
 
-        if probs.ndim == 1:
-            probs = np.expand_dims(probs, axis=1)
-
-        if probs.shape[1] == len(set(labels)):
-            try:
-                roc_auc = roc_auc_score(labels, probs, multi_class='ovr')
-            except ValueError:
-                roc_auc = None
-        else:
-            roc_auc = None
-
-        metrics = {
-            'accuracy': accuracy,
-            'precision': precision,
-            'recall': recall,
-            'f1': f1,
-            'mcc': mcc,
-            'confusion_matrix': conf_matrix.tolist()
-        }
-        
-        if roc_auc is not None:
-            metrics['roc_auc'] = roc_auc
-        
+        metrics = self.eval_metrics.compute()
+        self.last_confusion_matrix = self.eval_metrics.confusion_matrix.copy()
+        self.eval_metrics = StreamingMetrics(self.model.config.num_labels)
         return metrics
 
-    def train(self, train_dataset, val_dataset, resume_from_checkpoint=None):
-        output_dir = 'results'
+    def train(self, train_dataset, val_dataset, resume_from_checkpoint=None, output_dir='results', num_train_epochs=8, warmup_steps=500, learning_rate=3e-5, early_stopping_patience=None):
         os.makedirs(output_dir, exist_ok=True)
         
         training_args = TrainingArguments(
-            output_dir='results',
-            num_train_epochs=8,  
+            output_dir=output_dir,
+            num_train_epochs=num_train_epochs,  
             per_device_train_batch_size=4,
             per_device_eval_batch_size=4,
-            warmup_steps=500,
+            warmup_steps=warmup_steps,
             weight_decay=0.01,
             logging_dir='logs',
             logging_steps=10,
-            evaluation_strategy="epoch",
+            eval_strategy="epoch",
             save_strategy="epoch",
             save_steps=1000,
             save_total_limit=2,
-            learning_rate=3e-5,  
+            learning_rate=learning_rate,  
+            group_by_length=True,
+            batch_eval_metrics=True,
+            load_best_model_at_end=early_stopping_patience is not None,
+            metric_for_best_model='eval_loss' if early_stopping_patience is not None else None,
+            greater_is_better=False if early_stopping_patience is not None else None,
         )
 
+        callbacks = []
+        if early_stopping_patience is not None:
+            callbacks.append(EarlyStoppingCallback(early_stopping_patience=early_stopping_patience))
+
         trainer = Trainer(
             model=self.model,
             args=training_args,
             train_dataset=train_dataset,
             eval_dataset=val_dataset,
+            data_collator=self.data_collator,
             compute_metrics=self.compute_metrics,
+            callbacks=callbacks,
         )
 
         if resume_from_checkpoint:
@@ -99,13 +193,74 @@ class IntentRecognizer:
             
         self.save_model(self.model, self.tokenizer, output_dir)
 
-    def evaluate_model(intent_recognizer, val_dataset):
-        results = intent_recognizer.trainer.evaluate(eval_dataset=val_dataset)
+    def distill(self, train_dataset, val_dataset, output_dir='student', num_student_layers=3, alpha=0.5, temperature=None, num_train_epochs=4, learning_rate=5e-5):
+        from NeuralNetwork.distillation import DistillationTrainer, build_student, compare_models, save_report
+
+        os.makedirs(output_dir, exist_ok=True)
+        teacher = self.model
+        teacher.eval()
+        student = build_student(teacher, num_layers=num_student_layers).to(self.device)
+
+        training_args = TrainingArguments(
+            output_dir=output_dir,
+            num_train_epochs=num_train_epochs,
+            per_device_train_batch_size=16,
+            per_device_eval_batch_size=16,
+            warmup_ratio=0.1,
+            weight_decay=0.01,
+            logging_dir='logs',
+            logging_steps=10,
+            eval_strategy="epoch",
+            save_strategy="epoch",
+            save_total_limit=1,
+            learning_rate=learning_rate,
+            group_by_length=True,
+            batch_eval_metrics=True,
+            load_best_model_at_end=True,
+            metric_for_best_model='eval_loss',
+            greater_is_better=False,
+        )
+
+        trainer = DistillationTrainer(
+            model=student,
+            args=training_args,
+            train_dataset=train_dataset,
+            eval_dataset=val_dataset,
+            data_collator=self.data_collator,
+            compute_metrics=self.compute_metrics,
+            teacher_model=teacher,
+            temperature=temperature or self.temperature,
+            alpha=alpha,
+        )
+        trainer.train()
+
+        # A standard checkpoint with fewer layers, so every serving path loads it like the teacher.
+        self.save_model(student, self.tokenizer, output_dir)
+        report = compare_models(teacher, student, val_dataset, self.data_collator, self.device)
+        save_report(report, output_dir)
+        print(f"Distillation results: {report}")
+        return student, report
+
+    def evaluate(self, val_dataset, batch_size=32):
+        loader = DataLoader(val_dataset, batch_size=batch_size, shuffle=False, collate_fn=self.data_collator)
+        metrics = StreamingMetrics(self.model.config.num_labels)
+        self.model.eval()
+        with torch.no_grad():
+            for batch in loader:
+                labels = batch.pop('labels')
+                logits = self.model(**{k: v.to(self.device) for k, v in batch.items()}).logits
+                metrics.update(logits, labels)
+
+        results = metrics.compute()
+        self.last_confusion_matrix = metrics.confusion_matrix.copy()
         print("Evaluation results:", results)
         return results
 
+    def evaluate_model(self, val_dataset):
+        return self.evaluate(val_dataset)
+
 
-    def load_model(self, checkpoint_path, tokenizer_name=None):
+    def load_model(self, checkpoint_path, tokenizer_name=None, quantized=False, backend='torch', intra_op_threads=None, inter_op_threads=None):
         if not os.path.exists(checkpoint_path):
             raise FileNotFoundError(f"The specified checkpoint path '{checkpoint_path}' does not exist.")
 
@@ -116,37 +271,89 @@ class IntentRecognizer:
 
         # self.tokenizer = XLMRobertaTokenizer.from_pretrained(tokenizer_path)
 
-        model_safetensors_path = os.path.join(checkpoint_path, 'model.safetensors')
-        if not os.path.exists(model_safetensors_path):
-            raise FileNotFoundError(f"The specified model file '{model_safetensors_path}' does not exist.")
+        if quantized:
+            from NeuralNetwork.quantization import load_quantized_model
+            self.device = torch.device('cpu')
+            self.model = load_quantized_model(checkpoint_path)
+        else:
+            model_safetensors_path = os.path.join(checkpoint_path, 'model.safetensors')
+            if not os.path.exists(model_safetensors_path):
+                raise FileNotFoundError(f"The specified model file '{model_safetensors_path}' does not exist.")
+
+            self.model = XLMRobertaForSequenceClassification.from_pretrained(checkpoint_path)
+            state_dict = load_safetensors(model_safetensors_path, device='cpu')
+            self.model.load_state_dict(state_dict, strict=False)  
 
-        self.model = XLMRobertaForSequenceClassification.from_pretrained(checkpoint_path)
-        state_dict = load_safetensors(model_safetensors_path, device='cpu')
-        self.model.load_state_dict(state_dict, strict=False)  
+        if self.model.config.vocab_size != len(self.tokenizer):
+            # Vocabulary-pruned checkpoints ship their own remapped tokenizer.
+            self.tokenizer = load_tokenizer(checkpoint_path)
+            self.data_collator = DataCollatorWithPadding(self.tokenizer)
         self.model.to(self.device)
         self.model.eval()
 
-    def recognize_intent(self, text, threshold=0.5):
-        encodings = self.tokenizer(text, truncation=True, padding=True, return_tensors="pt").to(self.device)
-        logits_list = []
+        if backend == 'torch':
+            set_torch_threads(intra_op_threads, inter_op_threads)
+            self.backend = TorchBackend(self.model, self.device)
+        else:
+            # The torch model stays loaded for training, evaluation and MC-dropout; plain inference goes through the backend.
+            self.backend = load_backend(checkpoint_path, backend, intra_op_threads=intra_op_threads, inter_op_threads=inter_op_threads)
 
-        self.model.eval()  
+    def recognize_intent(self, text, threshold=0.5, mc_dropout=False):
+        return self.recognize_intents([text], threshold=threshold, mc_dropout=mc_dropout)[0]
 
-        with torch.no_grad():
-            for _ in range(self.num_mc_samples):
-                outputs = self.model(**{k: v.to(self.device) for k, v in encodings.items()})
-                logits_list.append(outputs.logits.unsqueeze(0))
+    def recognize_intents(self, texts, threshold=0.5, mc_dropout=False, num_mc_samples=None, batch_size=64):
+        if not texts:
+            return []
 
-        logits = torch.cat(logits_list, dim=0)
-        logits_mean = logits.mean(dim=0) / self.temperature
-        predicted_class_id = logits_mean.argmax().item()
-        confidence = F.softmax(logits_mean, dim=1)[0, predicted_class_id].item()
+        texts = list(texts)
+        num_samples = (num_mc_samples or self.num_mc_samples) if mc_dropout else 1
+        # Chunked so a large input (e.g. the whole feedback table) is never padded into one forward pass;
+        # with MC-dropout each chunk is still multiplied by K.
+        probs = torch.cat([self.predict_probs(texts[start:start + batch_size], num_samples) for start in range(0, len(texts), batch_size)])
+        confidences, predicted_class_ids = probs.max(dim=1)
 
-        if confidence < threshold:
-            return None, confidence
-        return predicted_class_id, confidence
+        results = []
+        for predicted_class_id, confidence in zip(predicted_class_ids.tolist(), confidences.tolist()):
+            if confidence < threshold:
+                results.append((None, confidence))
+            else:
+                results.append((predicted_class_id, confidence))
+        return results
+
+    def predict_probs(self, texts, num_samples=1):
+        encodings = self.tokenizer(texts, truncation=True, padding=True, return_tensors="pt").to(self.device)
+        batch_size = encodings['input_ids'].shape[0]
+
+        backend = self.backend
+        if num_samples > 1:
+            if not backend.supports_dropout:
+                backend = TorchBackend(self.model, self.device)
+            # Stack the K stochastic samples along the batch dimension so they share one forward pass.
+            encodings = {k: v.repeat(num_samples, 1) for k, v in encodings.items()}
+
+        if getattr(backend, 'model', None) is self.model:
+            with self._model_lock:
+                # Training leaves the model in train mode; eval() is safe here because no other forward pass is running.
+                if self.model.training:
+                    self.model.eval()
+                set_dropout(self.model, num_samples > 1)
+                try:
+                    logits = backend.predict_logits(encodings).to(self.device)
+                finally:
+                    set_dropout(self.model, False)
+        else:
+            logits = backend.predict_logits(encodings).to(self.device)
+
+        logits = logits.view(num_samples, batch_size, -1)
+        logits_mean = logits.mean(dim=0) / self.temperature
+        return F.softmax(logits_mean, dim=1)
 
     def save_model(self, model, tokenizer, save_directory):
+        if self.label_to_id:
+            model.config.label2id = dict(self.label_to_id)
+            model.config.id2label = {idx: label for label, idx in self.label_to_id.items()}
         model.save_pretrained(save_directory)
         tokenizer.save_pretrained(save_directory)
+        if self.label_to_id:
+            save_label_map(self.label_to_id, save_directory)
         print(f"Model and tokenizer saved to {save_directory}")
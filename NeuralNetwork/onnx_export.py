@@ -0,0 +1,84 @@
+import argparse
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+from Serving.backends import ONNX_MODEL_FILE, MODEL_INPUTS, OnnxBackend, TorchBackend
+
+PARITY_TEXTS = (
+    "en:What's the weather like today?",
+    "ru:Какая сегодня погода?",
+    "de:Wie spät ist es?",
+    "fr:Raconte-moi une blague",
+    "es:Pon una alarma para las siete de la mañana por favor",
+    "ok",
+)
+
+class LogitsOnly(torch.nn.Module):
+    # torch.onnx.export wants a tensor output rather than a ModelOutput.
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+
+def export_onnx(model_dir, output_file=ONNX_MODEL_FILE, opset_version=14):
+    model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+    model.eval()
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    sample = tokenizer(list(PARITY_TEXTS[:2]), return_tensors='pt', padding=True)
+
+    output_path = os.path.join(model_dir, output_file)
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in MODEL_INPUTS}
+    dynamic_axes['logits'] = {0: 'batch'}
+    with torch.no_grad():
+        torch.onnx.export(
+            LogitsOnly(model),
+            (sample['input_ids'], sample['attention_mask']),
+            output_path,
+            input_names=list(MODEL_INPUTS),
+            output_names=['logits'],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset_version,
+            do_constant_folding=True,
+        )
+    print(f"ONNX model saved to {output_path}")
+    return output_path
+
+def check_output_parity(model_dir, texts=PARITY_TEXTS, atol=1e-4, onnx_file=ONNX_MODEL_FILE, intra_op_threads=None, inter_op_threads=None):
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    torch_backend = TorchBackend(AutoModelForSequenceClassification.from_pretrained(model_dir).eval())
+    onnx_backend = OnnxBackend(os.path.join(model_dir, onnx_file), intra_op_threads=intra_op_threads, inter_op_threads=inter_op_threads)
+
+    # Batch size and padded length both differ from the export sample, which exercises the dynamic axes.
+    report = {'max_abs_diff': 0.0, 'prediction_agreement': 1.0}
+    for batch in (list(texts), list(texts[:1])):
+        encodings = tokenizer(batch, return_tensors='pt', truncation=True, padding=True)
+        torch_logits = torch_backend.predict_logits(encodings).cpu()
+        onnx_logits = onnx_backend.predict_logits(encodings)
+        report['max_abs_diff'] = max(report['max_abs_diff'], (torch_logits - onnx_logits).abs().max().item())
+        agreement = (torch_logits.argmax(dim=-1) == onnx_logits.argmax(dim=-1)).float().mean().item()
+        report['prediction_agreement'] = min(report['prediction_agreement'], agreement)
+
+    report['passed'] = report['max_abs_diff'] <= atol and report['prediction_agreement'] == 1.0
+    print(f"ONNX parity: {report}")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a fine-tuned checkpoint to ONNX with dynamic batch and sequence axes.")
+    parser.add_argument('--model-dir', default='./model')
+    parser.add_argument('--opset', type=int, default=14)
+    parser.add_argument('--atol', type=float, default=1e-4)
+    parser.add_argument('--skip-parity', action='store_true')
+    parser.add_argument('--intra-op-threads', type=int, default=None)
+    parser.add_argument('--inter-op-threads', type=int, default=None)
+    args = parser.parse_args()
+
+    export_onnx(args.model_dir, opset_version=args.opset)
+    if not args.skip_parity:
+        report = check_output_parity(args.model_dir, atol=args.atol, intra_op_threads=args.intra_op_threads, inter_op_threads=args.inter_op_threads)
+        if not report['passed']:
+            sys.exit(1)
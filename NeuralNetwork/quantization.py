@@ -0,0 +1,97 @@
+import argparse
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+from torch.utils.data import DataLoader
+from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer, DataCollatorWithPadding
+
+QUANTIZED_MODEL_FILE = 'model_int8.pt'
+
+def quantize_model(model):
+    model.eval()
+    return torch.quantization.quantize_dynamic(model.to('cpu'), {torch.nn.Linear}, dtype=torch.qint8)
+
+def export_quantized_model(model_dir, output_file=QUANTIZED_MODEL_FILE):
+    model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+    quantized_model = quantize_model(model)
+    output_path = os.path.join(model_dir, output_file)
+    # Packed int8 weights cannot be stored in safetensors, so the quantized state dict is pickled next to it.
+    torch.save(quantized_model.state_dict(), output_path)
+    print(f"Quantized model saved to {output_path}")
+    return quantized_model
+
+def load_quantized_model(model_dir, model_file=QUANTIZED_MODEL_FILE):
+    model_path = os.path.join(model_dir, model_file)
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"The specified quantized model file '{model_path}' does not exist. Run quantization.py --model-dir {model_dir} first.")
+
+    config = AutoConfig.from_pretrained(model_dir)
+    model = quantize_model(AutoModelForSequenceClassification.from_config(config))
+    # Packed int8 params are not plain tensors, so the weights_only default of torch >= 2.6 rejects them; this file is our own export.
+    model.load_state_dict(torch.load(model_path, map_location='cpu', weights_only=False))
+    model.eval()
+    return model
+
+def predict_labels(model, dataset, tokenizer, batch_size=32):
+    loader = DataLoader(dataset, batch_size=batch_size, shuffle=False, collate_fn=DataCollatorWithPadding(tokenizer))
+    predictions = []
+    labels = []
+    model.eval()
+    with torch.no_grad():
+        for batch in loader:
+            labels.append(batch.pop('labels'))
+            predictions.append(model(**batch).logits.argmax(dim=-1))
+    return torch.cat(predictions), torch.cat(labels)
+
+def check_accuracy_parity(fp32_model, int8_model, dataset, tokenizer, max_accuracy_drop=0.01):
+    fp32_predictions, labels = predict_labels(fp32_model.to('cpu'), dataset, tokenizer)
+    int8_predictions, _ = predict_labels(int8_model, dataset, tokenizer)
+
+    fp32_accuracy = (fp32_predictions == labels).float().mean().item()
+    int8_accuracy = (int8_predictions == labels).float().mean().item()
+    agreement = (fp32_predictions == int8_predictions).float().mean().item()
+    report = {
+        'fp32_accuracy': fp32_accuracy,
+        'int8_accuracy': int8_accuracy,
+        'prediction_agreement': agreement,
+        'passed': fp32_accuracy - int8_accuracy <= max_accuracy_drop,
+    }
+    print(f"Quantization parity: {report}")
+    return report
+
+if __name__ == "__main__":
+    import pandas as pd
+    from NeuralNetwork.model import IntentDataset, MemmapIntentDataset, VAL_SPLIT_FILE, load_label_map, load_val_split
+
+    parser = argparse.ArgumentParser(description="Export a dynamically quantized int8 copy of a fine-tuned checkpoint.")
+    parser.add_argument('--model-dir', default='./model')
+    parser.add_argument('--val-shards', help="Validation shards (shard_dir/val) of a checkpoint trained from shards")
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.01)
+    parser.add_argument('--skip-parity', action='store_true')
+    args = parser.parse_args()
+
+    int8_model = export_quantized_model(args.model_dir)
+    if not args.skip_parity:
+        # Parity is measured on the checkpoint's own held-out rows, tokenized exactly as they are when served.
+        tokenizer = AutoTokenizer.from_pretrained(args.model_dir)
+        if args.val_shards:
+            val_dataset = MemmapIntentDataset(args.val_shards)
+        else:
+            val_df = load_val_split(args.model_dir)
+            if val_df is None:
+                sys.exit(f"No {VAL_SPLIT_FILE} in {args.model_dir}; pass --val-shards for a shard-trained checkpoint or --skip-parity")
+            label_to_id = load_label_map(args.model_dir)
+            val_df = val_df[val_df['intent'].isin(label_to_id.keys())]
+            val_dataset = IntentDataset(tokenizer(val_df['text'].astype(str).tolist(), truncation=True),
+                                        pd.Series(val_df['intent'].map(label_to_id).tolist()))
+        report = check_accuracy_parity(
+            AutoModelForSequenceClassification.from_pretrained(args.model_dir),
+            int8_model,
+            val_dataset,
+            tokenizer,
+            max_accuracy_drop=args.max_accuracy_drop,
+        )
+        if not report['passed']:
+            sys.exit(1)
@@ -0,0 +1,140 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import torch
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+from NeuralNetwork.model import LABEL_MAP_FILE
+
+def read_corpus(paths):
+    texts = []
+    for path in paths:
+        if path.endswith('.csv'):
+            texts.extend(pd.read_csv(path, usecols=['text'])['text'].dropna().astype(str).tolist())
+        elif path.endswith('.json'):
+            with open(path, 'r', encoding='utf-8') as file:
+                phrases = json.load(file)["phrases"]
+            for intent_texts in phrases.values():
+                # Strip the "en:" style prefixes written by format_json.
+                texts.extend(text.split(':', 1)[1] if text[2:3] == ':' else text for text in intent_texts)
+        else:
+            with open(path, 'r', encoding='utf-8') as file:
+                texts.extend(line.strip() for line in file if line.strip())
+    return texts
+
+def collect_token_ids(tokenizer, texts, keep_corpus_chars=True, batch_size=1024):
+    used_ids = set(tokenizer.all_special_ids)
+    for i in range(0, len(texts), batch_size):
+        for ids in tokenizer(texts[i:i + batch_size], add_special_tokens=False)['input_ids']:
+            used_ids.update(ids)
+
+    if keep_corpus_chars:
+        # Keeping every single-character piece of the corpus alphabet lets unseen words still be
+        # segmented down to characters instead of collapsing to <unk>.
+        chars = set(''.join(texts))
+        vocab = tokenizer.get_vocab()
+        for char in chars:
+            for piece in (char, '▁' + char):
+                if piece in vocab:
+                    used_ids.add(vocab[piece])
+
+    return sorted(used_ids)
+
+def remap_post_processor(processor, old_to_new):
+    if processor is None:
+        return
+    if processor['type'] == 'Sequence':
+        for child in processor['processors']:
+            remap_post_processor(child, old_to_new)
+    elif processor['type'] == 'RobertaProcessing':
+        for key in ('sep', 'cls'):
+            processor[key][1] = old_to_new[processor[key][1]]
+    elif processor['type'] == 'TemplateProcessing':
+        for special_token in processor['special_tokens'].values():
+            special_token['ids'] = [old_to_new[idx] for idx in special_token['ids']]
+
+def prune_tokenizer(tokenizer, kept_ids):
+    old_to_new = {old_id: new_id for new_id, old_id in enumerate(kept_ids)}
+    tokenizer_json = json.loads(tokenizer.backend_tokenizer.to_str())
+
+    model = tokenizer_json['model']
+    if model['type'] != 'Unigram':
+        raise ValueError(f"Vocabulary pruning only supports Unigram tokenizers, got {model['type']}")
+    model['vocab'] = [model['vocab'][old_id] for old_id in kept_ids]
+    model['unk_id'] = old_to_new[model['unk_id']]
+
+    for added_token in tokenizer_json['added_tokens']:
+        added_token['id'] = old_to_new[added_token['id']]
+    remap_post_processor(tokenizer_json['post_processor'], old_to_new)
+
+    return tokenizer_json
+
+def prune_model(model, kept_ids):
+    old_to_new = {old_id: new_id for new_id, old_id in enumerate(kept_ids)}
+    old_embeddings = model.get_input_embeddings()
+    padding_idx = old_to_new[model.config.pad_token_id]
+
+    new_embeddings = torch.nn.Embedding(len(kept_ids), old_embeddings.embedding_dim, padding_idx=padding_idx)
+    new_embeddings.weight.data = old_embeddings.weight.data[torch.tensor(kept_ids)].clone()
+    model.set_input_embeddings(new_embeddings)
+
+    model.config.vocab_size = len(kept_ids)
+    for key in ('pad_token_id', 'bos_token_id', 'eos_token_id'):
+        token_id = getattr(model.config, key, None)
+        if token_id is not None:
+            setattr(model.config, key, old_to_new[token_id])
+    return model
+
+def prune_vocabulary(model_dir, output_dir, corpus_paths, keep_corpus_chars=True):
+    tokenizer = AutoTokenizer.from_pretrained(model_dir, use_fast=True)
+    model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+    texts = read_corpus(corpus_paths)
+
+    kept_ids = collect_token_ids(tokenizer, texts, keep_corpus_chars=keep_corpus_chars)
+    old_params = sum(p.numel() for p in model.parameters())
+    old_vocab_size = model.config.vocab_size
+
+    tokenizer_json = prune_tokenizer(tokenizer, kept_ids)
+    model = prune_model(model, kept_ids)
+
+    os.makedirs(output_dir, exist_ok=True)
+    model.save_pretrained(output_dir)
+    tokenizer.save_pretrained(output_dir)
+    with open(os.path.join(output_dir, 'tokenizer.json'), 'w', encoding='utf-8') as file:
+        json.dump(tokenizer_json, file, ensure_ascii=False)
+    # The SentencePiece model still describes the full vocabulary; only the rewritten tokenizer.json may be loaded.
+    slow_vocab_file = os.path.join(output_dir, 'sentencepiece.bpe.model')
+    if os.path.exists(slow_vocab_file):
+        os.remove(slow_vocab_file)
+    if os.path.exists(os.path.join(model_dir, LABEL_MAP_FILE)):
+        shutil.copy(os.path.join(model_dir, LABEL_MAP_FILE), output_dir)
+
+    pruned_tokenizer = AutoTokenizer.from_pretrained(output_dir)
+    old_to_new = {old_id: new_id for new_id, old_id in enumerate(kept_ids)}
+    sample = texts[:1000]
+    expected = [[old_to_new[idx] for idx in ids] for ids in tokenizer(sample)['input_ids']]
+    if pruned_tokenizer(sample)['input_ids'] != expected:
+        raise RuntimeError("Pruned tokenizer does not reproduce the original segmentation of the corpus")
+
+    new_params = sum(p.numel() for p in model.parameters())
+    print(f"Vocabulary pruned from {old_vocab_size} to {len(kept_ids)} tokens")
+    print(f"Parameters: {old_params:,} -> {new_params:,} ({new_params * 4 / 2**20:.1f} MB in fp32)")
+    print(f"Pruned model and tokenizer saved to {output_dir}")
+    return model, pruned_tokenizer
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shrink the XLM-R embedding matrix to the tokens used by our corpus.")
+    parser.add_argument('--model-dir', default='./model')
+    parser.add_argument('--output-dir', default='./model_pruned')
+    parser.add_argument('--corpus', nargs='+', default=['./Dataset/Resources/_dataset/dataset.csv'],
+                        help="Training corpus; .csv (text column), phrases .json or plain text files, one utterance per line")
+    parser.add_argument('--extra-corpus', nargs='*', default=[])
+    parser.add_argument('--no-corpus-chars', action='store_true', help="Do not keep single-character pieces of the corpus alphabet")
+    args = parser.parse_args()
+
+    prune_vocabulary(args.model_dir, args.output_dir, args.corpus + args.extra_corpus, keep_corpus_chars=not args.no_corpus_chars)
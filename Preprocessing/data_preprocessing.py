@@ -1,13 +1,42 @@
+import os
 import pandas as pd
 from sklearn.model_selection import train_test_split
-from transformers import XLMRobertaTokenizer
-from langdetect import detect
+from langdetect import detect, DetectorFactory
+from langdetect.lang_detect_exception import LangDetectException
+from concurrent.futures import ProcessPoolExecutor
+from Preprocessing.token_cache import TokenCache
+from Preprocessing.tokenization import load_tokenizer, encode_batch
+from Preprocessing.sharded_dataset import write_shards
+
+def detect_languages_chunk(texts):
+    DetectorFactory.seed = 0
+    languages = []
+    for text in texts:
+        try:
+            languages.append(detect(text))
+        except LangDetectException:
+            languages.append('unknown')
+    return languages
+
+def read_label_map(file_path='../Dataset/Resources/_dataset/dataset.csv', feedback_data=None):
+    # Same label order as prepare_data, without loading the text column or tokenizing anything.
+    intents = pd.read_csv(file_path, usecols=['intent'])['intent']
+    if feedback_data:
+        intents = pd.concat([intents, pd.Series([row[1] for row in feedback_data])], ignore_index=True)
+    return {label: idx for idx, label in enumerate(intents.unique())}
 
 class DataPreprocessor:
-    def __init__(self):
-        self.tokenizer = XLMRobertaTokenizer.from_pretrained('xlm-roberta-base')
+    def __init__(self, cache_dir='.token_cache', language_detection=True, num_workers=None, chunk_size=256, tokenizer_name='xlm-roberta-base'):
+        self.tokenizer = load_tokenizer(tokenizer_name)
+        self.token_cache = TokenCache(self.tokenizer, cache_dir) if cache_dir else None
+        self.language_detection = language_detection
+        self.num_workers = num_workers
+        self.chunk_size = chunk_size
+        self.language_cache = {}
+        # text/intent rows of the most recent validation split, saved next to the checkpoint after training.
+        self.last_val_split = None
 
-    def prepare_data(self, file_path='../Dataset/Resources/_dataset/dataset.csv', feedback_data=None):
+    def prepare_data(self, file_path='../Dataset/Resources/_dataset/dataset.csv', feedback_data=None, label_to_id=None):
         if file_path is not None:
             df = pd.read_csv(file_path)
         elif feedback_data is not None:
@@ -21,18 +50,91 @@ class DataPreprocessor:
             feedback_df = feedback_df[["text", "intent"]]
             df = pd.concat([df, feedback_df], ignore_index=True)
         
-        df['language'] = df['text'].apply(self.detect_language)
+        return self.split_and_encode(df, label_to_id)
+
+    def build_shards(self, file_path, output_dir, feedback_data=None, label_to_id=None, shard_size=100000):
+        df = pd.read_csv(file_path)
+        if feedback_data:
+            feedback_df = pd.DataFrame(feedback_data, columns=["text", "intent", "confidence", "rating"])
+            df = pd.concat([df, feedback_df[["text", "intent"]]], ignore_index=True)
+        if self.language_detection:
+            df = self.add_language_column(df)
+        elif 'language' not in df.columns:
+            df['language'] = 'unknown'
+        df['language'] = df['language'].fillna('unknown')
+
+        if label_to_id is None:
+            label_to_id = {label: idx for idx, label in enumerate(df['intent'].unique())}
+        else:
+            df = df[df['intent'].isin(label_to_id.keys())].reset_index(drop=True)
+        df['label_id'] = df['intent'].map(label_to_id)
+
+        train_df, val_df = train_test_split(df, test_size=0.2)
+        for split, split_df in (('train', train_df), ('val', val_df)):
+            encodings = self.tokenize(split_df['text'])
+            write_shards(encodings['input_ids'], split_df['label_id'].tolist(), split_df['language'].tolist(),
+                         os.path.join(output_dir, split), shard_size=shard_size, label_to_id=label_to_id)
+        print(f"Wrote {len(train_df)} train and {len(val_df)} val rows to {output_dir}")
+        return label_to_id
+
+    def prepare_incremental_data(self, feedback_data, label_to_id, file_path='../Dataset/Resources/_dataset/dataset.csv', replay_size=500, random_state=None):
+        feedback_df = pd.DataFrame(feedback_data, columns=["text", "intent", "confidence", "rating"])
+        feedback_df = feedback_df[["text", "intent"]]
+
+        # A small replay sample of the original corpus keeps the fine-tune from forgetting it.
+        corpus_df = pd.read_csv(file_path)
+        replay_df = corpus_df.sample(n=min(replay_size, len(corpus_df)), random_state=random_state)
+
+        df = pd.concat([feedback_df, replay_df], ignore_index=True)
+        return self.split_and_encode(df, label_to_id)
+
+    def split_and_encode(self, df, label_to_id=None):
+        if self.language_detection:
+            df = self.add_language_column(df)
         
-        label_to_id = {label: idx for idx, label in enumerate(df['intent'].unique())}
+        if label_to_id is None:
+            label_to_id = {label: idx for idx, label in enumerate(df['intent'].unique())}
+        else:
+            # Keep the ids of an existing checkpoint; rows with intents it does not know are dropped.
+            df = df[df['intent'].isin(label_to_id.keys())].reset_index(drop=True)
         df['label_id'] = df['intent'].map(label_to_id)
 
         train_texts, val_texts, train_labels, val_labels = train_test_split(df['text'], df['label_id'], test_size=0.2)
+        self.last_val_split = df.loc[val_texts.index, ['text', 'intent']]
 
-        train_encodings = self.tokenizer(list(train_texts), truncation=True, padding=True)
-        val_encodings = self.tokenizer(list(val_texts), truncation=True, padding=True)
+        # Padding is left to the collator so each batch is only padded to its own longest example.
+        train_encodings = self.tokenize(train_texts)
+        val_encodings = self.tokenize(val_texts)
 
         return train_encodings, val_encodings, train_labels, val_labels, label_to_id
 
+    def tokenize(self, texts):
+        if self.token_cache is not None:
+            return self.token_cache.encode(list(texts))
+        return encode_batch(self.tokenizer, texts)
+
+    def add_language_column(self, df):
+        # Rows that already carry a language (generate_dataset writes one) are never re-detected.
+        if 'language' not in df.columns:
+            df['language'] = None
+        missing = df['language'].isna()
+        if missing.any():
+            df.loc[missing, 'language'] = self.detect_languages(df.loc[missing, 'text'].astype(str).tolist())
+        return df
+
+    def detect_languages(self, texts):
+        pending = [text for text in dict.fromkeys(texts) if text not in self.language_cache]
+
+        if len(pending) <= self.chunk_size:
+            detected = detect_languages_chunk(pending)
+        else:
+            chunks = [pending[i:i + self.chunk_size] for i in range(0, len(pending), self.chunk_size)]
+            with ProcessPoolExecutor(max_workers=self.num_workers) as executor:
+                detected = [language for chunk in executor.map(detect_languages_chunk, chunks) for language in chunk]
+
+        self.language_cache.update(zip(pending, detected))
+        return [self.language_cache[text] for text in texts]
+
     def detect_language(self, text):
         try:
             return detect(text)
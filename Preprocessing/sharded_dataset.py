@@ -0,0 +1,63 @@
+import argparse
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+SHARD_META_FILE = 'meta.json'
+
+def write_shards(input_ids, labels, languages, output_dir, shard_size=100000, label_to_id=None):
+    os.makedirs(output_dir, exist_ok=True)
+    language_names = sorted({str(language) for language in languages})
+    language_codes = {language: code for code, language in enumerate(language_names)}
+    labels = np.asarray(labels, dtype=np.int64)
+
+    shard_names = []
+    shard_sizes = []
+    for shard, start in enumerate(range(0, len(input_ids), shard_size)):
+        end = min(start + shard_size, len(input_ids))
+        shard_name = f"shard-{shard:05d}"
+        shard_dir = os.path.join(output_dir, shard_name)
+        os.makedirs(shard_dir, exist_ok=True)
+
+        rows = [np.asarray(ids, dtype=np.int32) for ids in input_ids[start:end]]
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum([len(ids) for ids in rows], out=offsets[1:])
+
+        # Token IDs of all rows are stored back to back; offsets[i]:offsets[i + 1] delimits row i.
+        np.save(os.path.join(shard_dir, 'input_ids.npy'), np.concatenate(rows) if rows else np.empty(0, dtype=np.int32))
+        np.save(os.path.join(shard_dir, 'offsets.npy'), offsets)
+        np.save(os.path.join(shard_dir, 'labels.npy'), labels[start:end])
+        np.save(os.path.join(shard_dir, 'languages.npy'), np.array([language_codes[str(language)] for language in languages[start:end]], dtype=np.int16))
+
+        shard_names.append(shard_name)
+        shard_sizes.append(end - start)
+
+    meta = {
+        'shards': shard_names,
+        'shard_sizes': shard_sizes,
+        'languages': language_names,
+        'label_to_id': {label: int(idx) for label, idx in (label_to_id or {}).items()},
+    }
+    with open(os.path.join(output_dir, SHARD_META_FILE), 'w', encoding='utf-8') as file:
+        json.dump(meta, file, ensure_ascii=False, indent=4)
+    return meta
+
+def read_shard_meta(data_dir):
+    with open(os.path.join(data_dir, SHARD_META_FILE), 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+if __name__ == "__main__":
+    from Preprocessing.data_preprocessing import DataPreprocessor
+    from DB.database import fetch_feedback
+
+    parser = argparse.ArgumentParser(description="Tokenize a dataset CSV into memory-mappable train/val shards.")
+    parser.add_argument('--dataset', default='./Dataset/Resources/_dataset/dataset.csv')
+    parser.add_argument('--output-dir', default='./Dataset/Resources/_dataset/shards')
+    parser.add_argument('--shard-size', type=int, default=100000)
+    parser.add_argument('--no-feedback', action='store_true')
+    args = parser.parse_args()
+
+    DataPreprocessor().build_shards(args.dataset, args.output_dir, feedback_data=None if args.no_feedback else fetch_feedback(), shard_size=args.shard_size)
@@ -0,0 +1,79 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+from Preprocessing.tokenization import encode_batch
+
+
+class TokenCache:
+    def __init__(self, tokenizer, cache_dir='.token_cache'):
+        self.tokenizer = tokenizer
+        self.cache_dir = os.path.join(cache_dir, self.tokenizer_fingerprint(tokenizer))
+        self.tokens_path = os.path.join(self.cache_dir, 'tokens.bin')
+        self.index_path = os.path.join(self.cache_dir, 'index.json')
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as file:
+                self.index = json.load(file)
+        self.tokens = self._open_tokens()
+
+    @staticmethod
+    def tokenizer_fingerprint(tokenizer):
+        vocab = sorted(tokenizer.get_vocab().items(), key=lambda item: item[1])
+        vocab_hash = hashlib.sha1(json.dumps(vocab, ensure_ascii=False).encode('utf-8')).hexdigest()
+        key = json.dumps({
+            'name': os.path.basename(str(tokenizer.name_or_path).rstrip('/\\')),
+            'class': type(tokenizer).__name__,
+            'max_length': tokenizer.model_max_length,
+            'vocab': vocab_hash,
+        }, sort_keys=True)
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def text_hash(text):
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def _open_tokens(self):
+        if not os.path.exists(self.tokens_path) or os.path.getsize(self.tokens_path) == 0:
+            return np.empty(0, dtype=np.int32)
+        return np.memmap(self.tokens_path, dtype=np.int32, mode='r')
+
+    def _append(self, texts):
+        encoded = encode_batch(self.tokenizer, texts)['input_ids']
+
+        # Offsets are taken from the file size so tokens orphaned by an interrupted write are simply skipped.
+        offset = os.path.getsize(self.tokens_path) // 4 if os.path.exists(self.tokens_path) else 0
+        with open(self.tokens_path, 'ab') as file:
+            for text, ids in zip(texts, encoded):
+                file.write(ids.tobytes())
+                self.index[self.text_hash(text)] = [offset, len(ids)]
+                offset += len(ids)
+
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.index, file)
+        os.replace(tmp_path, self.index_path)
+        self.tokens = self._open_tokens()
+
+    def encode(self, texts):
+        texts = [str(text) for text in texts]
+        hashes = [self.text_hash(text) for text in texts]
+
+        missing = {}
+        for text, key in zip(texts, hashes):
+            if key not in self.index and key not in missing:
+                missing[key] = text
+        if missing:
+            self._append(list(missing.values()))
+
+        input_ids = []
+        attention_mask = []
+        for key in hashes:
+            offset, length = self.index[key]
+            input_ids.append(self.tokens[offset:offset + length])
+            attention_mask.append(np.ones(length, dtype=np.int32))
+
+        return {'input_ids': input_ids, 'attention_mask': attention_mask}
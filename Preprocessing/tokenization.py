@@ -0,0 +1,66 @@
+import argparse
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from transformers import AutoTokenizer
+
+def load_tokenizer(name_or_path='xlm-roberta-base'):
+    tokenizer = AutoTokenizer.from_pretrained(name_or_path, use_fast=True)
+    if not tokenizer.is_fast:
+        raise ValueError(f"No fast tokenizer is available for '{name_or_path}'; install the 'tokenizers' package or add a tokenizer.json")
+    return tokenizer
+
+def encode_batch(tokenizer, texts, batch_size=4096):
+    # The Rust tokenizer parallelises each batch call across threads, so large batches matter more than Python-side workers.
+    texts = [str(text) for text in texts]
+    lengths = np.empty(len(texts), dtype=np.int64)
+    chunks = []
+    for start in range(0, len(texts), batch_size):
+        # Padded NumPy output comes straight from the Rust side; the mask then drops the padding in one vectorised step.
+        encoded = tokenizer(texts[start:start + batch_size], truncation=True, padding=True, return_tensors='np')
+        mask = encoded['attention_mask'].astype(bool)
+        lengths[start:start + len(mask)] = mask.sum(axis=1)
+        chunks.append(encoded['input_ids'][mask].astype(np.int32, copy=False))
+
+    # One contiguous buffer; every example is a view into it rather than its own Python list.
+    tokens = np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int32)
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    input_ids = [tokens[offsets[i]:offsets[i + 1]] for i in range(len(texts))]
+    attention_mask = [np.ones(length, dtype=np.int32) for length in lengths]
+    return {'input_ids': input_ids, 'attention_mask': attention_mask}
+
+def check_tokenizer_parity(name_or_path, texts):
+    from transformers import XLMRobertaTokenizer
+
+    slow_tokenizer = XLMRobertaTokenizer.from_pretrained(name_or_path)
+    fast_ids = encode_batch(load_tokenizer(name_or_path), texts)['input_ids']
+
+    mismatches = []
+    for text, fast in zip(texts, fast_ids):
+        slow = slow_tokenizer(str(text), truncation=True)['input_ids']
+        if list(slow) != fast.tolist():
+            mismatches.append({'text': str(text), 'slow': slow, 'fast': fast.tolist()})
+
+    report = {'texts': len(texts), 'mismatches': len(mismatches), 'examples': mismatches[:10], 'passed': not mismatches}
+    print(f"Tokenizer parity: {len(texts) - len(mismatches)}/{len(texts)} identical")
+    for mismatch in mismatches[:10]:
+        print(f"  {mismatch['text']!r}\n    slow: {mismatch['slow']}\n    fast: {mismatch['fast']}")
+    return report
+
+if __name__ == "__main__":
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Check that the fast tokenizer produces the same ids as the SentencePiece one.")
+    parser.add_argument('--tokenizer', default='xlm-roberta-base')
+    parser.add_argument('--dataset', default='./Dataset/Resources/_dataset/dataset.csv')
+    parser.add_argument('--limit', type=int, help="Only check a random sample of this many texts")
+    args = parser.parse_args()
+
+    texts = pd.read_csv(args.dataset)['text'].astype(str).drop_duplicates()
+    if args.limit and args.limit < len(texts):
+        texts = texts.sample(n=args.limit, random_state=0)
+    report = check_tokenizer_parity(args.tokenizer, texts.tolist())
+    if not report['passed']:
+        sys.exit(1)
@@ -0,0 +1,100 @@
+import logging
+import os
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+ONNX_MODEL_FILE = 'model.onnx'
+MODEL_INPUTS = ('input_ids', 'attention_mask')
+
+def to_numpy(values):
+    if isinstance(values, torch.Tensor):
+        return values.detach().cpu().numpy()
+    return np.asarray(values)
+
+class TorchBackend:
+    name = 'torch'
+    supports_dropout = True
+
+    def __init__(self, model, device=None):
+        self.model = model
+        self.device = device or torch.device('cpu')
+
+    def predict_logits(self, encodings):
+        inputs = {name: torch.as_tensor(encodings[name]).to(self.device) for name in MODEL_INPUTS}
+        with torch.no_grad():
+            return self.model(**inputs).logits
+
+class OnnxBackend:
+    name = 'onnx'
+    # The graph is exported in eval mode, so dropout is folded away and MC-dropout has to run on torch.
+    supports_dropout = False
+
+    GRAPH_OPTIMIZATION_LEVELS = {
+        'disable': 'ORT_DISABLE_ALL',
+        'basic': 'ORT_ENABLE_BASIC',
+        'extended': 'ORT_ENABLE_EXTENDED',
+        'all': 'ORT_ENABLE_ALL',
+    }
+
+    def __init__(self, model_path, intra_op_threads=None, inter_op_threads=None, graph_optimization='all'):
+        import onnxruntime as ort
+
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"The specified ONNX model '{model_path}' does not exist. Run NeuralNetwork/onnx_export.py --model-dir {os.path.dirname(model_path)} first.")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = getattr(ort.GraphOptimizationLevel, self.GRAPH_OPTIMIZATION_LEVELS[graph_optimization])
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads:
+            options.inter_op_num_threads = inter_op_threads
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL if inter_op_threads > 1 else ort.ExecutionMode.ORT_SEQUENTIAL
+
+        self.model_path = model_path
+        self.device = torch.device('cpu')
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=['CPUExecutionProvider'])
+        self.input_names = [node.name for node in self.session.get_inputs()]
+
+    def predict_logits(self, encodings):
+        feeds = {name: to_numpy(encodings[name]).astype(np.int64, copy=False) for name in self.input_names}
+        logits = self.session.run(['logits'], feeds)[0]
+        return torch.from_numpy(logits)
+
+BACKENDS = ('torch', 'onnx')
+
+def set_torch_threads(intra_op_threads=None, inter_op_threads=None):
+    # torch thread pools are process-wide, unlike ONNX Runtime's per-session ones.
+    if intra_op_threads:
+        torch.set_num_threads(intra_op_threads)
+    if inter_op_threads:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError as e:
+            logger.warning(f"Could not set inter-op threads to {inter_op_threads}, torch already started its pool: {e}")
+
+def load_backend(model_dir, backend='torch', quantized=False, device=None, intra_op_threads=None, inter_op_threads=None):
+    if backend == 'torch':
+        from transformers import AutoModelForSequenceClassification
+
+        set_torch_threads(intra_op_threads, inter_op_threads)
+
+        if quantized:
+            from NeuralNetwork.quantization import load_quantized_model
+            # Dynamically quantized int8 kernels only run on CPU.
+            device = torch.device('cpu')
+            model = load_quantized_model(model_dir)
+        else:
+            device = device or torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+            model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+        model.to(device)
+        model.eval()
+        return TorchBackend(model, device)
+
+    if backend == 'onnx':
+        if quantized:
+            raise ValueError("quantized=True only applies to the torch backend")
+        return OnnxBackend(os.path.join(model_dir, ONNX_MODEL_FILE), intra_op_threads=intra_op_threads, inter_op_threads=inter_op_threads)
+
+    raise ValueError(f"Unknown inference backend '{backend}', expected one of {BACKENDS}")
@@ -0,0 +1,131 @@
+import logging
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class _Request:
+    __slots__ = ('payload', 'future', 'enqueued_at')
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    def __init__(self, process_batch, max_batch_size=32, max_wait_ms=10, latency_window=10000, stats_interval=60, num_workers=1):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.stats_interval = stats_interval
+
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._latencies = deque(maxlen=latency_window)
+        self._processed = 0
+        self._last_stats_log = time.monotonic()
+
+        # More than one worker only helps when process_batch releases the GIL across calls, e.g. a multi-process backend.
+        self._workers = [threading.Thread(target=self._run, name=f'MicroBatcher-{idx}', daemon=True) for idx in range(num_workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, payload):
+        if self._stop.is_set():
+            raise RuntimeError("MicroBatcher has been stopped")
+        request = _Request(payload)
+        self._queue.put(request)
+        return request.future
+
+    def __call__(self, payload, timeout=None):
+        return self.submit(payload).result(timeout=timeout)
+
+    def _collect_batch(self):
+        try:
+            first = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set() or not self._queue.empty():
+            batch = self._collect_batch()
+            if not batch:
+                continue
+            try:
+                self._process(batch)
+            except Exception as e:
+                # A worker that dies leaves every later submit() waiting forever, so nothing may escape the loop.
+                logger.error(f"Inference worker failed while handling a batch of {len(batch)}: {e}", exc_info=True)
+
+    def _process(self, batch):
+        # Callers may cancel while a request is queued (e.g. a cancelled asyncio.wrap_future await);
+        # those are dropped here, and the rest can no longer be cancelled once they are marked running.
+        batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        try:
+            results = self.process_batch([request.payload for request in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"Batch function returned {len(results)} results for {len(batch)} inputs")
+        except Exception as e:
+            logger.error(f"Batch of {len(batch)} failed: {e}", exc_info=True)
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        finished_at = time.perf_counter()
+        for request, result in zip(batch, results):
+            request.future.set_result(result)
+
+        with self._lock:
+            self._batch_sizes[len(batch)] += 1
+            self._processed += len(batch)
+            self._latencies.extend((finished_at - request.enqueued_at) * 1000.0 for request in batch)
+
+        if self.stats_interval and time.monotonic() - self._last_stats_log >= self.stats_interval:
+            self._last_stats_log = time.monotonic()
+            logger.info(f"Inference queue stats: {self.stats()}")
+
+    def stats(self):
+        with self._lock:
+            latencies = np.fromiter(self._latencies, dtype=np.float64)
+            batch_sizes = dict(sorted(self._batch_sizes.items()))
+            processed = self._processed
+
+        num_batches = sum(batch_sizes.values())
+        return {
+            'queue_depth': self._queue.qsize(),
+            'processed': processed,
+            'batches': num_batches,
+            'mean_batch_size': processed / num_batches if num_batches else 0.0,
+            'batch_size_histogram': batch_sizes,
+            'latency_p50_ms': float(np.percentile(latencies, 50)) if latencies.size else None,
+            'latency_p99_ms': float(np.percentile(latencies, 99)) if latencies.size else None,
+        }
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for worker in self._workers:
+            worker.join(timeout=timeout)
@@ -0,0 +1,67 @@
+import logging
+import os
+import threading
+from NeuralNetwork.model import checkpoint_version
+
+logger = logging.getLogger(__name__)
+
+def memory_usage_mb():
+    usage = {'rss_mb': None, 'peak_rss_mb': None}
+    try:
+        # Linux reports both the current and the high-water resident set here.
+        with open('/proc/self/status', 'r') as file:
+            for line in file:
+                if line.startswith('VmRSS:'):
+                    usage['rss_mb'] = round(int(line.split()[1]) / 1024, 1)
+                elif line.startswith('VmHWM:'):
+                    usage['peak_rss_mb'] = round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        try:
+            import resource
+            # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS.
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            usage['peak_rss_mb'] = round(peak / (1024 * 1024) if os.uname().sysname == 'Darwin' else peak / 1024, 1)
+        except ImportError:
+            pass
+    return usage
+
+def reset_peak_memory():
+    # Writing 5 to clear_refs resets VmHWM to the current RSS (Linux >= 4.0), so the next reading is the peak since now.
+    try:
+        with open('/proc/self/clear_refs', 'w') as file:
+            file.write('5')
+        return True
+    except OSError:
+        return False
+
+class ModelWatcher:
+    def __init__(self, manager, model_dir=None, interval=10.0):
+        self.manager = manager
+        self.model_dir = model_dir or manager.model_dir
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='ModelWatcher', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        logger.info(f"Watching '{self.model_dir}' for new checkpoints every {self.interval}s")
+        return self
+
+    def _run(self):
+        seen = checkpoint_version(self.model_dir)
+        while not self._stop.wait(self.interval):
+            version = checkpoint_version(self.model_dir)
+            if version == seen:
+                continue
+            # A trainer may still be writing files; only reload once the fingerprint holds for a full interval.
+            seen = version
+            if self._stop.wait(self.interval) or checkpoint_version(self.model_dir) != version:
+                continue
+            try:
+                self.manager.reload(self.model_dir)
+            except Exception as e:
+                logger.error(f"Hot reload from '{self.model_dir}' failed, still serving the previous model: {e}", exc_info=True)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,77 @@
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+_PUNCTUATION = re.compile(r'[^\w\s]')
+_WHITESPACE = re.compile(r'\s+')
+
+def normalize_text(text):
+    text = unicodedata.normalize('NFKC', str(text)).casefold()
+    text = _PUNCTUATION.sub(' ', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+class PredictionCache:
+    def __init__(self, maxsize=10000, ttl=3600, model_version=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.model_version = model_version
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, text):
+        return (normalize_text(text), self.model_version)
+
+    def get(self, text, model_version=None):
+        key = self._key(text)
+        with self._lock:
+            if model_version is not None and model_version != self.model_version:
+                # The caller is serving a different checkpoint than the cached entries belong to.
+                self.misses += 1
+                return None
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[1] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, text, value, model_version=None):
+        key = self._key(text)
+        with self._lock:
+            if model_version is not None and model_version != self.model_version:
+                # Computed by a checkpoint that has been swapped out while the request was in flight.
+                return
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def set_model_version(self, model_version):
+        # Predictions from another checkpoint must never be served, so a version change drops everything.
+        with self._lock:
+            if model_version != self.model_version:
+                self.model_version = model_version
+                self._entries.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'model_version': self.model_version,
+            }
@@ -0,0 +1,162 @@
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+import torch
+from Serving.utterance_index import TrafficStats
+
+logger = logging.getLogger(__name__)
+
+def worker_loop(manager, worker_id, num_threads, requests, responses):
+    # Each worker owns a fixed slice of the cores instead of every process fighting over all of them.
+    # Inter-op threads were fixed in the supervisor before the model loaded; they cannot be changed once the pool exists.
+    torch.set_num_threads(num_threads)
+    logger.info(f"Inference worker {worker_id} started (pid {os.getpid()}, {num_threads} threads)")
+    while True:
+        item = requests.get()
+        if item is None:
+            return
+        request_id, texts = item
+        try:
+            responses.put((request_id, manager.process_inputs(texts), None))
+        except Exception as e:
+            logger.error(f"Worker {worker_id} failed on a batch of {len(texts)}: {e}", exc_info=True)
+            responses.put((request_id, None, f"{type(e).__name__}: {e}"))
+
+class PreforkSupervisor:
+    def __init__(self, num_workers=None, threads_per_worker=1, inter_op_threads=1, manager_factory=None, poll_interval=0.2, **manager_kwargs):
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise RuntimeError("Pre-fork serving needs the 'fork' start method, which this platform does not provide")
+        if manager_kwargs.get('backend', 'torch') != 'torch':
+            raise ValueError("Pre-fork serving shares torch tensors; ONNX Runtime sessions are not fork-safe")
+
+        self.num_workers = num_workers or max(1, (os.cpu_count() or 1) // threads_per_worker)
+        self.threads_per_worker = threads_per_worker
+        self.poll_interval = poll_interval
+
+        # Thread counts are set before anything touches torch, so every forked worker inherits pools of the right size.
+        torch.set_num_threads(threads_per_worker)
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError as e:
+            logger.warning(f"Could not set inter-op threads to {inter_op_threads}, torch already started its pool: {e}")
+
+        if manager_factory is None:
+            from TGBot.TGmanager import BotAssistantManager
+            manager_factory = BotAssistantManager
+        # CUDA contexts do not survive fork, so the shared replica always lives on CPU.
+        self.manager = manager_factory(device=torch.device('cpu'), **manager_kwargs)
+        if self.manager.model is not None:
+            # Weights go into shared memory once; forked workers map the same pages instead of copying ~1 GB each.
+            self.manager.model.share_memory()
+
+        self._context = multiprocessing.get_context('fork')
+        self._responses = self._context.Queue()
+        # Each worker gets its own request queue so the supervisor always knows which worker holds which request.
+        self._worker_queues = [None] * self.num_workers
+        self._in_flight = [set() for _ in range(self.num_workers)]
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._request_ids = itertools.count()
+        self._stopped = False
+        # Workers' own counters die with them and are never visible here, so traffic is counted from their results.
+        self.traffic_stats = TrafficStats()
+
+        # By now the manager has opened the feedback store, so its writer thread and sqlite connection already exist.
+        # Workers never write feedback (save_user_feedback runs here), and DB.database drops inherited stores in a
+        # forked child, so anything a worker does reach opens a fresh connection. Otherwise workers, including later
+        # replacements, only use the inherited model and their own queues.
+        self.workers = [self._spawn_worker(worker_id) for worker_id in range(self.num_workers)]
+        self._collector = threading.Thread(target=self._collect_responses, name='PreforkCollector', daemon=True)
+        self._collector.start()
+        logger.info(f"Pre-fork supervisor started {self.num_workers} workers x {threads_per_worker} threads")
+
+    def _spawn_worker(self, worker_id):
+        # A worker that died mid-read may leave its queue locked, so every (re)start gets a fresh one.
+        self._worker_queues[worker_id] = self._context.Queue()
+        process = self._context.Process(
+            target=worker_loop,
+            args=(self.manager, worker_id, self.threads_per_worker, self._worker_queues[worker_id], self._responses),
+            name=f'InferenceWorker-{worker_id}',
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    def _collect_responses(self):
+        while not self._stopped:
+            try:
+                request_id, result, error = self._responses.get(timeout=self.poll_interval)
+            except queue.Empty:
+                pass
+            else:
+                self._resolve(request_id, result, error)
+            # Checked on every iteration so a dead worker is noticed under steady load too.
+            self._replace_dead_workers()
+
+    def _resolve(self, request_id, result, error):
+        with self._pending_lock:
+            entry = self._pending.pop(request_id, None)
+            if entry is None:
+                return
+            future, worker_id = entry
+            self._in_flight[worker_id].discard(request_id)
+        if error is not None:
+            future.set_exception(RuntimeError(error))
+        else:
+            self.traffic_stats.record(item[4] for item in result)
+            future.set_result(result)
+
+    def _replace_dead_workers(self):
+        for worker_id, process in enumerate(self.workers):
+            if self._stopped or process.is_alive():
+                continue
+            logger.error(f"Inference worker {worker_id} (pid {process.pid}) exited with code {process.exitcode}, restarting it")
+            with self._pending_lock:
+                lost = [self._pending.pop(request_id)[0] for request_id in self._in_flight[worker_id]]
+                self._in_flight[worker_id] = set()
+                self.workers[worker_id] = self._spawn_worker(worker_id)
+            for future in lost:
+                future.set_exception(RuntimeError(f"Inference worker {worker_id} exited before answering the request"))
+
+    def submit(self, texts):
+        if self._stopped:
+            raise RuntimeError("PreforkSupervisor has been stopped")
+        future = Future()
+        with self._pending_lock:
+            request_id = next(self._request_ids)
+            worker_id = min(range(self.num_workers), key=lambda idx: len(self._in_flight[idx]))
+            self._pending[request_id] = (future, worker_id)
+            self._in_flight[worker_id].add(request_id)
+            self._worker_queues[worker_id].put((request_id, list(texts)))
+        return future
+
+    def process_inputs(self, user_inputs, timeout=None):
+        return self.submit(user_inputs).result(timeout=timeout)
+
+    def process_input(self, user_input):
+        return self.process_inputs([user_input])[0]
+
+    def save_user_feedback(self, *args, **kwargs):
+        # Feedback is written from the supervisor; workers never touch the database.
+        self.manager.save_user_feedback(*args, **kwargs)
+
+    def stop(self, timeout=5):
+        if self._stopped:
+            return
+        self._stopped = True
+        for worker_queue in self._worker_queues:
+            worker_queue.put(None)
+        for process in self.workers:
+            process.join(timeout=timeout)
+            if process.is_alive():
+                process.terminate()
+        self._collector.join(timeout=timeout)
+        with self._pending_lock:
+            for future, _ in self._pending.values():
+                future.set_exception(RuntimeError("PreforkSupervisor stopped before the request completed"))
+            self._pending.clear()
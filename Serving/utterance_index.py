@@ -0,0 +1,211 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from Serving.prediction_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+UTTERANCE_INDEX_FILE = 'utterance_index.json'
+UTTERANCE_SIGNATURES_FILE = 'utterance_signatures.npy'
+HASH_PRIME = (1 << 31) - 1
+
+def shingles(text, ngram=3):
+    padded = f" {text} "
+    if len(padded) <= ngram:
+        return {padded}
+    return {padded[i:i + ngram] for i in range(len(padded) - ngram + 1)}
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+class UtteranceIndex:
+    def __init__(self, num_perm=64, bands=16, ngram=3, threshold=0.8, seed=1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.ngram = ngram
+        self.threshold = threshold
+        self.seed = seed
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, HASH_PRIME, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, HASH_PRIME, size=num_perm).astype(np.uint64)
+
+        self.texts = []
+        self.intents = []
+        self.exact = {}
+        self.signatures = np.empty((0, num_perm), dtype=np.uint32)
+        self._buckets = [{} for _ in range(bands)]
+
+    def signature(self, text):
+        hashes = np.fromiter((zlib.crc32(shingle.encode('utf-8')) & HASH_PRIME for shingle in shingles(text, self.ngram)), dtype=np.uint64)
+        # a * x stays below 2^62, so the universal hash never overflows uint64.
+        return ((hashes[:, None] * self._a[None, :] + self._b[None, :]) % HASH_PRIME).min(axis=0).astype(np.uint32)
+
+    def band_keys(self, signature):
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def add(self, texts, intents):
+        start = len(self.texts)
+        signatures = []
+        for text, intent in zip(texts, intents):
+            text = normalize_text(text)
+            if not text:
+                continue
+            if text in self.exact:
+                # The same utterance labelled with two intents is not safe to answer without the model.
+                if self.exact[text] != intent:
+                    self.exact[text] = None
+                continue
+            self.exact[text] = intent
+            self.texts.append(text)
+            self.intents.append(intent)
+            signatures.append(self.signature(text))
+
+        if signatures:
+            self.signatures = np.vstack([self.signatures, np.stack(signatures)])
+        for idx in range(start, len(self.texts)):
+            self._add_to_buckets(idx)
+        return self
+
+    def _add_to_buckets(self, idx):
+        for bucket, key in zip(self._buckets, self.band_keys(self.signatures[idx])):
+            bucket.setdefault(key, []).append(idx)
+
+    def lookup(self, text):
+        # Returns (intent, similarity, kind) with kind 'exact_match' or 'near_match', or None when the model has to decide.
+        text = normalize_text(text)
+        match = self._exact_match(text)
+        if match is not None:
+            return match + ('exact_match',)
+        if self.threshold is not None and text:
+            match = self._near_match(text)
+            if match is not None:
+                return match + ('near_match',)
+        return None
+
+    def _exact_match(self, text):
+        intent = self.exact.get(text)
+        return (intent, 1.0) if intent is not None else None
+
+    def _near_match(self, text):
+        candidates = set()
+        for bucket, key in zip(self._buckets, self.band_keys(self.signature(text))):
+            candidates.update(bucket.get(key, ()))
+        if not candidates:
+            return None
+
+        # LSH only proposes candidates; the similarity that is compared against the threshold is the exact Jaccard.
+        query = shingles(text, self.ngram)
+        scored = sorted(((jaccard(query, shingles(self.texts[idx], self.ngram)), idx) for idx in candidates), reverse=True)
+        best_similarity, best_idx = scored[0]
+        if best_similarity < self.threshold or self.exact.get(self.texts[best_idx]) is None:
+            return None
+        if any(similarity == best_similarity and self.intents[idx] != self.intents[best_idx] for similarity, idx in scored[1:]):
+            return None
+        return self.intents[best_idx], best_similarity
+
+    def save(self, output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+        np.save(os.path.join(output_dir, UTTERANCE_SIGNATURES_FILE), self.signatures)
+        meta = {
+            'num_perm': self.num_perm,
+            'bands': self.bands,
+            'ngram': self.ngram,
+            'seed': self.seed,
+            'texts': self.texts,
+            'intents': self.intents,
+            'ambiguous': [text for text, intent in self.exact.items() if intent is None],
+        }
+        with open(os.path.join(output_dir, UTTERANCE_INDEX_FILE), 'w', encoding='utf-8') as file:
+            json.dump(meta, file, ensure_ascii=False)
+        print(f"Utterance index with {len(self.texts)} utterances saved to {output_dir}")
+
+    @classmethod
+    def load(cls, model_dir, threshold=0.8):
+        index_path = os.path.join(model_dir, UTTERANCE_INDEX_FILE)
+        if not os.path.exists(index_path):
+            return None
+        with open(index_path, 'r', encoding='utf-8') as file:
+            meta = json.load(file)
+
+        index = cls(num_perm=meta['num_perm'], bands=meta['bands'], ngram=meta['ngram'], threshold=threshold, seed=meta['seed'])
+        index.texts = meta['texts']
+        index.intents = meta['intents']
+        index.exact = dict(zip(index.texts, index.intents))
+        index.exact.update({text: None for text in meta['ambiguous']})
+        index.signatures = np.load(os.path.join(model_dir, UTTERANCE_SIGNATURES_FILE))
+        for idx in range(len(index.texts)):
+            index._add_to_buckets(idx)
+        return index
+
+class TrafficStats:
+    # Counts what answered each request. It lives on the manager, so the numbers survive hot reloads.
+    INDEX_SOURCES = ('exact_match', 'near_match')
+
+    def __init__(self, stats_interval=600):
+        self.stats_interval = stats_interval
+        self.counts = Counter()
+        self._lock = threading.Lock()
+        self._last_stats_log = time.monotonic()
+
+    def record(self, sources):
+        with self._lock:
+            self.counts.update(sources)
+            log_stats = self.stats_interval and time.monotonic() - self._last_stats_log >= self.stats_interval
+            if log_stats:
+                self._last_stats_log = time.monotonic()
+        if log_stats:
+            logger.info(f"Traffic stats: {self.stats()}")
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+        requests = sum(counts.values())
+        served = sum(counts.get(source, 0) for source in self.INDEX_SOURCES)
+        return {
+            'requests': requests,
+            'by_source': counts,
+            'index_served_fraction': served / requests if requests else 0.0,
+        }
+
+def build_utterance_index(dataset, output_dir, label_to_id=None, feedback_data=None, **index_options):
+    import pandas as pd
+
+    df = pd.read_csv(dataset)
+    texts = df['text'].astype(str).tolist()
+    intents = df['intent'].astype(str).tolist()
+    if feedback_data:
+        # Feedback rows carry the user's corrected intent, which is exactly what a repeat of that message should get.
+        texts += [row[0] for row in feedback_data]
+        intents += [row[1] for row in feedback_data]
+    if label_to_id is not None:
+        pairs = [(text, intent) for text, intent in zip(texts, intents) if intent in label_to_id]
+        texts, intents = [pair[0] for pair in pairs], [pair[1] for pair in pairs]
+
+    index = UtteranceIndex(**index_options).add(texts, intents)
+    index.save(output_dir)
+    return index
+
+if __name__ == "__main__":
+    from NeuralNetwork.model import load_label_map
+
+    parser = argparse.ArgumentParser(description="Build the exact/near-duplicate utterance index for a trained model.")
+    parser.add_argument('--model-dir', default='./model')
+    parser.add_argument('--dataset', default='./Dataset/Resources/_dataset/dataset.csv')
+    parser.add_argument('--num-perm', type=int, default=64)
+    parser.add_argument('--bands', type=int, default=16)
+    args = parser.parse_args()
+
+    build_utterance_index(args.dataset, args.model_dir, label_to_id=load_label_map(args.model_dir), num_perm=args.num_perm, bands=args.bands)
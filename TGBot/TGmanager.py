@@ -3,54 +3,191 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from safetensors.torch import load_file as load_safetensors
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+from transformers import AutoTokenizer
 import torch
 import os
-from Preprocessing.data_preprocessing import DataPreprocessor
-from NeuralNetwork.model import IntentRecognizer
+import gc
+import time
+import threading
+import logging
+from NeuralNetwork.model import load_label_map, checkpoint_version
 from ResponseGen.response_generation import ResponseGenerator
 from DB.database import fetch_feedback, save_rating, create_database
+from Serving.prediction_cache import PredictionCache, normalize_text
+from Serving.backends import load_backend
+from Serving.hot_reload import memory_usage_mb, reset_peak_memory
+from Serving.utterance_index import UtteranceIndex, TrafficStats
 
-class BotAssistantManager:
-    def __init__(self, model_dir="../model"):
+logger = logging.getLogger(__name__)
+
+WARMUP_TEXTS = ("en:hello", "ru:который час?", "de:Welches Datum ist heute?", "fr:au revoir")
+
+class ModelBundle:
+    # Everything that has to change together when a checkpoint is swapped in.
+    def __init__(self, model_dir, tokenizer, backend, label_to_id, response_generator, version, utterance_index=None):
         self.model_dir = model_dir
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
-        self.model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+        self.utterance_index = utterance_index
+        self.tokenizer = tokenizer
+        self.backend = backend
+        self.label_to_id = label_to_id
+        self.response_generator = response_generator
+        self.version = version
+
+class BotAssistantManager:
+    def __init__(self, model_dir="../model", dataset="../Dataset/Resources/_dataset/dataset.csv", quantized=False, cache_size=10000, cache_ttl=3600,
+                 backend='torch', intra_op_threads=None, inter_op_threads=None, device=None, index_threshold=0.8):
+        self.dataset = dataset
+        # Similarity above which a near-duplicate of a training utterance skips the model; None disables near matches.
+        self.index_threshold = index_threshold
+        self.backend_options = {'backend': backend, 'quantized': quantized, 'device': device,
+                                'intra_op_threads': intra_op_threads, 'inter_op_threads': inter_op_threads}
+        self._reload_lock = threading.Lock()
 
         create_database()
-        
-        self.load_model(model_dir)
-        self.model.to(self.device)
-        self.model.eval()
 
-        self.data_preprocessor = DataPreprocessor()
-        feedback_data = fetch_feedback()
-        self.train_encodings, self.val_encodings, self.train_labels, self.val_labels, self.label_to_id = self.data_preprocessor.prepare_data(feedback_data=feedback_data)
+        self.bundle = self.load_bundle(model_dir)
+        self.prediction_cache = PredictionCache(maxsize=cache_size, ttl=cache_ttl, model_version=self.bundle.version)
+        self.traffic_stats = TrafficStats()
+
+    # Read-only views of the live bundle, kept for callers that predate hot reloading.
+    @property
+    def model_dir(self):
+        return self.bundle.model_dir
+
+    @property
+    def tokenizer(self):
+        return self.bundle.tokenizer
+
+    @property
+    def backend(self):
+        return self.bundle.backend
+
+    @property
+    def device(self):
+        return self.bundle.backend.device
+
+    @property
+    def model(self):
+        return getattr(self.bundle.backend, 'model', None)
+
+    @property
+    def label_to_id(self):
+        return self.bundle.label_to_id
+
+    @property
+    def response_generator(self):
+        return self.bundle.response_generator
+
+    def load_bundle(self, model_dir):
+        version = checkpoint_version(model_dir)
+        tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        # from_pretrained already loads model.safetensors, so the weights are read exactly once.
+        backend = load_backend(model_dir, **self.backend_options)
 
-        self.intent_recognizer = IntentRecognizer(num_labels=len(self.label_to_id))
-        self.response_generator = ResponseGenerator(intent_labels={v: k for k, v in self.label_to_id.items()})
+        label_to_id = load_label_map(model_dir)
+        if label_to_id is None:
+            logger.warning(f"No label map found in '{model_dir}', rebuilding it from {self.dataset}")
+            from Preprocessing.data_preprocessing import read_label_map
+            label_to_id = read_label_map(self.dataset, feedback_data=fetch_feedback())
+
+        response_generator = ResponseGenerator(intent_labels={v: k for k, v in label_to_id.items()})
+        utterance_index = UtteranceIndex.load(model_dir, threshold=self.index_threshold)
+        if utterance_index is None:
+            logger.warning(f"No utterance index in '{model_dir}', every message goes through the model")
+        return ModelBundle(model_dir, tokenizer, backend, label_to_id, response_generator, version, utterance_index)
+
+    def reload(self, model_dir=None, warmup_batches=3):
+        model_dir = model_dir or self.model_dir
+        with self._reload_lock:
+            start = time.perf_counter()
+            memory_before = memory_usage_mb()
+            # Without a reset the high-water mark would be the process lifetime peak, not this reload's.
+            peak_is_reload_only = reset_peak_memory()
+
+            bundle = self.load_bundle(model_dir)
+            for _ in range(warmup_batches):
+                self.run_model(WARMUP_TEXTS, bundle)
+            warm_at = time.perf_counter()
+
+            # The cache switches first, so no request on the new bundle can see an entry from the old checkpoint.
+            # Then a single reference assignment: requests that already picked up the old bundle finish on it.
+            self.prediction_cache.set_model_version(bundle.version)
+            old_bundle, self.bundle = self.bundle, bundle
+
+            del old_bundle
+            gc.collect()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+
+            memory_after = memory_usage_mb()
+            logger.info(f"Reloaded model from '{model_dir}' (version {bundle.version}): "
+                        f"load+warmup {warm_at - start:.2f}s, total {time.perf_counter() - start:.2f}s, "
+                        f"rss {memory_before['rss_mb']} -> {memory_after['rss_mb']} MB, "
+                        f"{'reload' if peak_is_reload_only else 'process'} peak {memory_after['peak_rss_mb']} MB")
+            return bundle.version
 
     def load_model(self, checkpoint_path):
         model_safetensors_path = os.path.join(checkpoint_path, 'model.safetensors')
         if not os.path.exists(model_safetensors_path):
             raise FileNotFoundError(f"The specified model file '{model_safetensors_path}' does not exist.")
-
-        state_dict = load_safetensors(model_safetensors_path, device='cpu')
-        self.model.load_state_dict(state_dict, strict=False)  
+        self.reload(checkpoint_path)
 
     def process_input(self, user_input):
-        inputs = self.tokenizer(user_input, return_tensors='pt', truncation=True, padding=True).to(self.device)
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-        logits = outputs.logits
-        confidence, predicted_class = torch.max(logits, dim=1)
-        confidence = torch.softmax(logits, dim=1)[0][predicted_class].item()
-        intent_id = predicted_class.item()
-        response = self.response_generator.handle_intent(intent_id, confidence)
-        intent_label = self.response_generator.intent_labels[intent_id] if intent_id is not None else "unknown"
-        return response, confidence, intent_label, intent_id, inputs
+        return self.process_inputs([user_input])[0]
+
+    def process_inputs(self, user_inputs):
+        bundle = self.bundle
+        results = []
+        for user_input, (intent_id, confidence, source) in zip(user_inputs, self.predict(user_inputs, bundle)):
+            # Responses are rendered on every call so time-dependent answers stay fresh on cache hits.
+            response = bundle.response_generator.handle_intent(intent_id, confidence)
+            intent_label = bundle.response_generator.intent_labels[intent_id] if intent_id is not None else "unknown"
+            # source says what answered: 'exact_match', 'near_match', 'cache' or 'model'.
+            results.append((response, confidence, intent_label, intent_id, source))
+        return results
+
+    def predict(self, user_inputs, bundle=None):
+        bundle = bundle or self.bundle
+        predictions = [None] * len(user_inputs)
+        pending = {}
+        for idx, user_input in enumerate(user_inputs):
+            indexed = self.lookup_utterance(user_input, bundle)
+            if indexed is not None:
+                predictions[idx] = indexed
+                continue
+            cached = self.prediction_cache.get(user_input, model_version=bundle.version)
+            if cached is not None:
+                intent_id, confidence = cached
+                predictions[idx] = (intent_id, confidence, 'cache')
+            else:
+                # Grouped by the cache key, so inputs differing only in case, punctuation or spacing share one forward pass.
+                pending.setdefault(normalize_text(user_input), []).append(idx)
+
+        if pending:
+            texts = [user_inputs[indices[0]] for indices in pending.values()]
+            for text, indices, prediction in zip(texts, pending.values(), self.run_model(texts, bundle)):
+                self.prediction_cache.put(text, prediction[:2], model_version=bundle.version)
+                for idx in indices:
+                    predictions[idx] = prediction
+
+        self.traffic_stats.record(prediction[2] for prediction in predictions)
+        return predictions
+
+    def lookup_utterance(self, user_input, bundle):
+        if bundle.utterance_index is None:
+            return None
+        match = bundle.utterance_index.lookup(user_input)
+        if match is None or match[0] not in bundle.label_to_id:
+            return None
+        intent, similarity, kind = match
+        return bundle.label_to_id[intent], similarity, kind
+
+    def run_model(self, user_inputs, bundle=None):
+        bundle = bundle or self.bundle
+        inputs = bundle.tokenizer(list(user_inputs), return_tensors='pt', truncation=True, padding=True)
+        probs = torch.softmax(bundle.backend.predict_logits(inputs), dim=1)
+        confidences, predicted_classes = probs.max(dim=1)
+        return [(intent_id, confidence, 'model') for intent_id, confidence in zip(predicted_classes.tolist(), confidences.tolist())]
 
     def save_user_feedback(self, user_input, response, rating, intent, expected_intent, confidence):
         save_rating(user_input, response, int(rating), intent, expected_intent, confidence)
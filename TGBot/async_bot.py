@@ -0,0 +1,216 @@
+import argparse
+import asyncio
+import enum
+import logging
+from telebot.async_telebot import AsyncTeleBot
+from telebot import asyncio_helper
+from telebot.types import ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
+from TGmanager import BotAssistantManager
+from Serving.batching import MicroBatcher
+from Serving.backends import BACKENDS
+from Serving.prefork import PreforkSupervisor
+from Serving.hot_reload import ModelWatcher
+from bot import INTENTS, ADMIN_IDS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class FeedbackState(enum.Enum):
+    AWAITING_RATING = 'awaiting_rating'
+    AWAITING_INTENT = 'awaiting_intent'
+
+class FeedbackSession:
+    def __init__(self, user_input, response, intent, confidence, message_ids):
+        self.state = FeedbackState.AWAITING_RATING
+        self.user_input = user_input
+        self.response = response
+        self.intent = intent
+        self.confidence = confidence
+        self.rating = None
+        # Bot and user messages belonging to this exchange, removed once the feedback is saved.
+        self.message_ids = list(message_ids)
+
+class AsyncTelegramBot:
+    def __init__(self, api_key, assistant_manager=None, api_url=None, max_batch_size=16, max_wait_ms=10, delete_delay=1.0):
+        if api_url:
+            # Lets the bot run against a local fake Telegram API, e.g. "http://127.0.0.1:8081/bot{0}/{1}".
+            asyncio_helper.API_URL = api_url
+        self.bot = AsyncTeleBot(api_key)
+        self.assistant_manager = assistant_manager or BotAssistantManager()
+        # A pre-fork supervisor serves one batch per worker process, so keep that many batches in flight.
+        self.inference_queue = MicroBatcher(self.assistant_manager.process_inputs, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms,
+                                            num_workers=getattr(self.assistant_manager, 'num_workers', 1))
+        self.delete_delay = delete_delay
+        self.INTENTS = INTENTS
+        self.sessions = {}
+        self._background_tasks = set()
+        self.setup_handlers()
+
+    def setup_handlers(self):
+        @self.bot.message_handler(commands=['start'])
+        async def send_welcome(message):
+            try:
+                self.log_admin_activity("User started interaction", message.chat.id)
+                await self.bot.reply_to(message, "Добро пожаловать! Напишите сообщение, чтобы начать. Используйте /help для списка доступных команд.\nВерсия alpha0.1")
+            except Exception as e:
+                await self.handle_error(message, e)
+
+        @self.bot.message_handler(commands=['help'])
+        async def send_help(message):
+            try:
+                help_text = (
+                    "Доступные команды:\n"
+                    "/start - Начать взаимодействие с ботом\n"
+                    "/help - Показать это сообщение помощи\n"
+                    "/intents - Список доступных намерений и их переводов\n"
+                )
+                self.log_admin_activity("User requested help", message.chat.id)
+                await self.bot.reply_to(message, help_text)
+            except Exception as e:
+                await self.handle_error(message, e)
+
+        @self.bot.message_handler(commands=['intents'])
+        async def list_intents(message):
+            try:
+                response = "Список намерений:\n"
+                for intent, translation in self.INTENTS.items():
+                    response += f"{intent} - {translation}\n"
+                self.log_admin_activity("User requested intents", message.chat.id)
+                await self.bot.reply_to(message, response)
+            except Exception as e:
+                await self.handle_error(message, e)
+
+        @self.bot.message_handler(commands=['reload'])
+        async def reload_model(message):
+            try:
+                if message.from_user.id not in ADMIN_IDS:
+                    await self.bot.reply_to(message, "Команда доступна только администраторам.")
+                    return
+                if not hasattr(self.assistant_manager, 'reload'):
+                    await self.bot.reply_to(message, "Горячая перезагрузка недоступна в этом режиме.")
+                    return
+                self.log_admin_activity("Model reload requested", message.chat.id)
+                # Loading and warm-up happen off the event loop; inference keeps using the old model until the swap.
+                version = await asyncio.get_running_loop().run_in_executor(None, self.assistant_manager.reload)
+                await self.bot.reply_to(message, f"Модель перезагружена, версия {version}")
+            except Exception as e:
+                await self.handle_error(message, e)
+
+        @self.bot.message_handler(func=lambda message: True)
+        async def dispatch_message(message):
+            try:
+                session = self.sessions.get(message.chat.id)
+                if session is not None and session.state == FeedbackState.AWAITING_RATING and self.parse_rating(message.text) is not None:
+                    await self.process_rating(message, session)
+                elif session is not None and session.state == FeedbackState.AWAITING_INTENT:
+                    await self.process_expected_intent(message, session)
+                else:
+                    # Anything that is not an answer to a pending feedback question starts a new exchange.
+                    self.sessions.pop(message.chat.id, None)
+                    await self.handle_message(message)
+            except Exception as e:
+                await self.handle_error(message, e)
+
+    async def handle_message(self, message):
+        user_input = message.text
+        # The micro-batcher's worker thread runs the model, so the event loop only awaits the future.
+        response, confidence, intent, intent_id, source = await asyncio.wrap_future(self.inference_queue.submit(user_input))
+        bot_reply = await self.bot.reply_to(message, f"Бот: {response}\nУверенность: {confidence:.2f}\nНамерение: {intent}\nintent_id: {intent_id}\nИсточник: {source}")
+
+        markup = ReplyKeyboardMarkup(row_width=5, resize_keyboard=True, one_time_keyboard=True)
+        markup.add(KeyboardButton('1'), KeyboardButton('2'), KeyboardButton('3'), KeyboardButton('4'), KeyboardButton('5'))
+        msg_rating = await self.bot.send_message(message.chat.id, "Оцените ответ (1-5):", reply_markup=markup)
+
+        self.sessions[message.chat.id] = FeedbackSession(user_input, response, intent, confidence, [bot_reply.message_id, msg_rating.message_id])
+        self.schedule_delete(message.chat.id, [message.message_id])
+
+    async def process_rating(self, message, session):
+        session.rating = self.parse_rating(message.text)
+        markup = ReplyKeyboardMarkup(row_width=2, resize_keyboard=True, one_time_keyboard=True)
+        for intent_name, translation in self.INTENTS.items():
+            markup.add(KeyboardButton(intent_name))
+
+        msg_intent = await self.bot.send_message(message.chat.id, "Какое намерение вы ожидали?", reply_markup=markup)
+        session.message_ids.append(msg_intent.message_id)
+        session.state = FeedbackState.AWAITING_INTENT
+        self.schedule_delete(message.chat.id, [message.message_id])
+
+    async def process_expected_intent(self, message, session):
+        expected_intent = message.text
+        if expected_intent not in self.INTENTS:
+            await self.bot.reply_to(message, "Некорректное намерение. Пожалуйста, попробуйте еще раз.")
+            return
+
+        self.sessions.pop(message.chat.id, None)
+        self.assistant_manager.save_user_feedback(session.user_input, session.response, session.rating, session.intent, expected_intent, session.confidence)
+
+        thank_you_msg = await self.bot.send_message(message.chat.id, "Спасибо за ваш отзыв!", reply_markup=ReplyKeyboardRemove())
+        self.schedule_delete(message.chat.id, session.message_ids + [thank_you_msg.message_id, message.message_id])
+
+    def parse_rating(self, text):
+        if text is not None and text.strip().isdigit() and 1 <= int(text) <= 5:
+            return int(text)
+        return None
+
+    def schedule_delete(self, chat_id, message_ids):
+        task = asyncio.create_task(self.delete_later(chat_id, message_ids))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def delete_later(self, chat_id, message_ids):
+        await asyncio.sleep(self.delete_delay)
+        for message_id in message_ids:
+            try:
+                await self.bot.delete_message(chat_id, message_id)
+            except Exception as e:
+                logger.warning(f"Could not delete message {message_id} in chat {chat_id}: {e}")
+
+    def log_admin_activity(self, activity, user_id):
+        logger.info(f"Admin Activity: {activity} by User ID: {user_id}")
+
+    async def handle_error(self, message, error):
+        logger.error(f"An error occurred: {error}", exc_info=True)
+        error_message = "Произошла ошибка. Пожалуйста, попробуйте еще раз позже."
+        try:
+            await self.bot.reply_to(message, error_message)
+        except Exception as e:
+            logger.error(f"Could not report the error to chat {message.chat.id}: {e}")
+
+    async def run_async(self):
+        logger.info("Async bot is starting...")
+        try:
+            await self.bot.infinity_polling(interval=0, timeout=20)
+        finally:
+            await self.bot.close_session()
+            self.inference_queue.stop()
+            if hasattr(self.assistant_manager, 'stop'):
+                self.assistant_manager.stop()
+
+    def run(self):
+        asyncio.run(self.run_async())
+
+if __name__ == '__main__':
+    from env import TELEGRAM_BOT_API_KEY
+
+    parser = argparse.ArgumentParser(description="Run the Telegram bot on an asyncio event loop.")
+    parser.add_argument('--api-url', help="Telegram Bot API URL template, e.g. http://127.0.0.1:8081/bot{0}/{1} for the fake server")
+    parser.add_argument('--max-batch-size', type=int, default=16)
+    parser.add_argument('--max-wait-ms', type=float, default=10)
+    parser.add_argument('--backend', choices=BACKENDS, default='torch', help="Inference backend; onnx needs NeuralNetwork/onnx_export.py to have been run on the model")
+    parser.add_argument('--intra-op-threads', type=int, help="Threads per inference call; with --workers it is the per-worker thread count")
+    parser.add_argument('--inter-op-threads', type=int)
+    parser.add_argument('--workers', type=int, default=1, help="Fork this many inference workers sharing one copy of the weights")
+    parser.add_argument('--threads-per-worker', type=int, default=1)
+    parser.add_argument('--watch-model', action='store_true', help="Hot-reload the model when the checkpoint in model/ changes")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        assistant_manager = PreforkSupervisor(num_workers=args.workers, threads_per_worker=args.intra_op_threads or args.threads_per_worker,
+                                              inter_op_threads=args.inter_op_threads or 1, manager_factory=BotAssistantManager, backend=args.backend)
+    else:
+        assistant_manager = BotAssistantManager(backend=args.backend, intra_op_threads=args.intra_op_threads, inter_op_threads=args.inter_op_threads)
+    if args.watch_model and hasattr(assistant_manager, 'reload'):
+        ModelWatcher(assistant_manager).start()
+    bot = AsyncTelegramBot(TELEGRAM_BOT_API_KEY, assistant_manager=assistant_manager, api_url=args.api_url,
+                           max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+    bot.run()
@@ -1,8 +1,12 @@
 import logging
+import os
 import telebot
 from telebot.types import ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
 from telebot import apihelper
 from TGmanager import BotAssistantManager
+from Serving.batching import MicroBatcher
+from Serving.prefork import PreforkSupervisor
+from Serving.hot_reload import ModelWatcher
 from DB.database import save_rating, create_database
 from env import TELEGRAM_BOT_API_KEY
 import time
@@ -10,17 +14,29 @@ import time
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Comma-separated Telegram user ids allowed to run admin commands such as /reload.
+ADMIN_IDS = {int(user_id) for user_id in os.environ.get('TELEGRAM_ADMIN_IDS', '').split(',') if user_id.strip()}
+
+INTENTS = {
+    'get_time': 'узнать время',
+    'get_date': 'узнать дату',
+    'greet': 'приветствие',
+    'goodbye': 'прощание',
+    'No Intent': 'Нет намерения' 
+}
+
 class TelegramBot:
-    def __init__(self, api_key):
-        self.bot = telebot.TeleBot(api_key)
-        self.assistant_manager = BotAssistantManager()
-        self.INTENTS = {
-            'get_time': 'узнать время',
-            'get_date': 'узнать дату',
-            'greet': 'приветствие',
-            'goodbye': 'прощание',
-            'No Intent': 'Нет намерения' 
-        }
+    def __init__(self, api_key, max_batch_size=16, max_wait_ms=10, workers=1, threads_per_worker=1, watch_model=False, intra_op_threads=None, inter_op_threads=None):
+        # Handler threads block on their inference future, so allow enough of them to fill a batch for every worker.
+        self.bot = telebot.TeleBot(api_key, num_threads=max_batch_size * workers)
+        if workers > 1:
+            self.assistant_manager = PreforkSupervisor(num_workers=workers, threads_per_worker=intra_op_threads or threads_per_worker,
+                                                       inter_op_threads=inter_op_threads or 1, manager_factory=BotAssistantManager)
+        else:
+            self.assistant_manager = BotAssistantManager(intra_op_threads=intra_op_threads, inter_op_threads=inter_op_threads)
+        self.inference_queue = MicroBatcher(self.assistant_manager.process_inputs, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, num_workers=workers)
+        self.model_watcher = ModelWatcher(self.assistant_manager).start() if watch_model and hasattr(self.assistant_manager, 'reload') else None
+        self.INTENTS = INTENTS
         self.setup_handlers()
 
     def setup_handlers(self):
@@ -57,12 +73,28 @@ class TelegramBot:
             except Exception as e:
                 self.handle_error(message, e)
 
+        @self.bot.message_handler(commands=['reload'])
+        def reload_model(message):
+            try:
+                if message.from_user.id not in ADMIN_IDS:
+                    self.bot.reply_to(message, "Команда доступна только администраторам.")
+                    return
+                if not hasattr(self.assistant_manager, 'reload'):
+                    self.bot.reply_to(message, "Горячая перезагрузка недоступна в этом режиме.")
+                    return
+                self.log_admin_activity("Model reload requested", message.chat.id)
+                # Runs on this handler thread; other handler threads keep serving on the old model meanwhile.
+                version = self.assistant_manager.reload()
+                self.bot.reply_to(message, f"Модель перезагружена, версия {version}")
+            except Exception as e:
+                self.handle_error(message, e)
+
         @self.bot.message_handler(func=lambda message: True)
         def handle_message(message):
             try:
                 user_input = message.text
-                response, confidence, intent, intent_id, inputs = self.assistant_manager.process_input(user_input)
-                bot_reply = self.bot.reply_to(message, f"Бот: {response}\nУверенность: {confidence:.2f}\nНамерение: {intent}\nintent_id: {intent_id}\ninputs: {inputs}")
+                response, confidence, intent, intent_id, source = self.inference_queue.submit(user_input).result()
+                bot_reply = self.bot.reply_to(message, f"Бот: {response}\nУверенность: {confidence:.2f}\nНамерение: {intent}\nintent_id: {intent_id}\nИсточник: {source}")
 
                 markup = ReplyKeyboardMarkup(row_width=5, resize_keyboard=True, one_time_keyboard=True)
                 markup.add(KeyboardButton('1'), KeyboardButton('2'), KeyboardButton('3'), KeyboardButton('4'), KeyboardButton('5'))
@@ -135,5 +167,16 @@ class TelegramBot:
                 time.sleep(15) 
 
 if __name__ == '__main__':
-    bot = TelegramBot(TELEGRAM_BOT_API_KEY)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the Telegram bot.")
+    parser.add_argument('--workers', type=int, default=1, help="Fork this many inference workers sharing one copy of the weights")
+    parser.add_argument('--threads-per-worker', type=int, default=1)
+    parser.add_argument('--intra-op-threads', type=int, help="Threads per inference call; with --workers it is the per-worker thread count")
+    parser.add_argument('--inter-op-threads', type=int)
+    parser.add_argument('--watch-model', action='store_true', help="Hot-reload the model when the checkpoint in model/ changes")
+    args = parser.parse_args()
+
+    bot = TelegramBot(TELEGRAM_BOT_API_KEY, workers=args.workers, threads_per_worker=args.threads_per_worker, watch_model=args.watch_model,
+                      intra_op_threads=args.intra_op_threads, inter_op_threads=args.inter_op_threads)
     bot.run()
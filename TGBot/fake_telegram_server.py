@@ -0,0 +1,130 @@
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import time
+from aiohttp import web
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class FakeTelegramServer:
+    def __init__(self, host='127.0.0.1', port=8081, bot_username='fake_intent_bot'):
+        self.host = host
+        self.port = port
+        self.bot_user = {'id': 1, 'is_bot': True, 'first_name': 'FakeBot', 'username': bot_username}
+        self.updates = []
+        self.sent_messages = []
+        self.deleted_messages = []
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._new_update = asyncio.Event()
+        self._runner = None
+
+        self.app = web.Application()
+        self.app.router.add_route('*', '/bot{token}/{method}', self.handle_method)
+
+    @property
+    def api_url(self):
+        return f"http://{self.host}:{self.port}/bot{{0}}/{{1}}"
+
+    def push_text(self, chat_id, text, user_id=None):
+        message = {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': user_id or chat_id, 'is_bot': False, 'first_name': 'Tester'},
+            'text': text,
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        self.updates.append({'update_id': next(self._update_ids), 'message': message})
+        self._new_update.set()
+        return message
+
+    def messages_for(self, chat_id):
+        return [message for message in self.sent_messages if message['chat']['id'] == chat_id]
+
+    async def read_params(self, request):
+        params = dict(request.query)
+        if request.can_read_body:
+            if request.content_type == 'application/json':
+                params.update(await request.json())
+            else:
+                params.update(await request.post())
+        return params
+
+    async def handle_method(self, request):
+        method = request.match_info['method']
+        params = await self.read_params(request)
+        handler = getattr(self, f"api_{method.lower()}", None)
+        result = await handler(params) if handler else True
+        return web.json_response({'ok': True, 'result': result})
+
+    async def api_getme(self, params):
+        return self.bot_user
+
+    async def api_getupdates(self, params):
+        offset = int(params.get('offset') or 0)
+        timeout = float(params.get('timeout') or 0)
+        self.updates = [update for update in self.updates if update['update_id'] >= offset]
+        if not self.updates and timeout:
+            self._new_update.clear()
+            try:
+                await asyncio.wait_for(self._new_update.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.updates
+
+    async def api_sendmessage(self, params):
+        chat_id = int(params['chat_id'])
+        message = {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': self.bot_user,
+            'text': params.get('text', ''),
+        }
+        if 'reply_markup' in params:
+            message['reply_markup'] = json.loads(params['reply_markup']) if isinstance(params['reply_markup'], str) else params['reply_markup']
+        self.sent_messages.append(message)
+        logger.info(f"sendMessage to {chat_id}: {message['text']!r}")
+        return message
+
+    async def api_deletemessage(self, params):
+        self.deleted_messages.append((int(params['chat_id']), int(params['message_id'])))
+        return True
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Fake Telegram API listening on {self.api_url}")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+async def serve_interactive(server, chat_id):
+    # Lines typed on stdin are delivered to the bot as messages from a single chat.
+    await server.start()
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            line = await loop.run_in_executor(None, input, "You: ")
+            if line.strip().lower() == 'exit':
+                break
+            server.push_text(chat_id, line)
+    finally:
+        await server.stop()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Minimal local stand-in for the Telegram Bot API.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--chat-id', type=int, default=1000)
+    args = parser.parse_args()
+
+    asyncio.run(serve_interactive(FakeTelegramServer(args.host, args.port), args.chat_id))
@@ -0,0 +1,185 @@
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Benchmarks always run on CPU and never reach out to the hub.
+os.environ.setdefault('CUDA_VISIBLE_DEVICES', '')
+os.environ.setdefault('HF_HUB_OFFLINE', '1')
+os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+
+import numpy as np
+import torch
+
+from benchmarks.tiny_model import build_synthetic_dataset, build_tiny_checkpoint
+from Preprocessing.data_preprocessing import read_label_map
+
+METRICS_LOWER_IS_BETTER = ('p50_ms', 'p95_ms', 'p99_ms')
+METRICS_HIGHER_IS_BETTER = ('throughput',)
+
+def parse_int_list(value):
+    return [int(item) for item in value.split(',') if item]
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (2**20 if sys.platform == 'darwin' else 2**10)
+
+def make_utterances(tokenizer, texts, seq_len, count, rng):
+    # Concatenate synthetic utterances until they reach the target token length, then cut them back to it.
+    utterances = []
+    for _ in range(count):
+        parts = [rng.choice(texts)]
+        while len(tokenizer(' '.join(parts))['input_ids']) < seq_len:
+            parts.append(rng.choice(texts))
+        ids = tokenizer(' '.join(parts), add_special_tokens=False)['input_ids'][:max(seq_len - 2, 1)]
+        utterances.append(tokenizer.decode(ids))
+    return utterances
+
+def time_calls(func, batches, warmup):
+    for batch in batches[:warmup]:
+        func(batch)
+    latencies = []
+    start = time.perf_counter()
+    for batch in batches[warmup:]:
+        call_start = time.perf_counter()
+        func(batch)
+        latencies.append((time.perf_counter() - call_start) * 1000.0)
+    elapsed = time.perf_counter() - start
+    return np.array(latencies), elapsed
+
+def summarize(component, latencies, elapsed, batch_size, seq_len, threads, mc_samples):
+    num_calls = len(latencies)
+    return {
+        'component': component,
+        'batch_size': batch_size,
+        'seq_len': seq_len,
+        'threads': threads,
+        'mc_samples': mc_samples,
+        'calls': num_calls,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'throughput': batch_size * num_calls / elapsed,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+def result_key(result):
+    return (result['component'], result['batch_size'], result['seq_len'], result['threads'], result['mc_samples'])
+
+def compare_to_baseline(results, baseline, tolerance):
+    baseline_by_key = {result_key(result): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        reference = baseline_by_key.get(result_key(result))
+        if reference is None:
+            continue
+        for metric in METRICS_LOWER_IS_BETTER:
+            if result[metric] > reference[metric] * (1 + tolerance):
+                regressions.append({'key': result_key(result), 'metric': metric, 'baseline': reference[metric], 'current': result[metric]})
+        for metric in METRICS_HIGHER_IS_BETTER:
+            if result[metric] < reference[metric] * (1 - tolerance):
+                regressions.append({'key': result_key(result), 'metric': metric, 'baseline': reference[metric], 'current': result[metric]})
+    return regressions
+
+def run(args):
+    from NeuralNetwork.model import IntentRecognizer
+    from TGBot.TGmanager import BotAssistantManager
+    from manager import AssistantManager
+    from DB.database import create_database
+
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix='neuralclassifier-bench-')
+    os.chdir(workdir)
+    create_database()
+
+    dataset_csv = os.path.join(workdir, 'dataset.csv')
+    df = build_synthetic_dataset(dataset_csv, num_samples=args.num_samples, seed=args.seed)
+    texts = df['text'].astype(str).tolist()
+    label_to_id = read_label_map(dataset_csv)
+    model_dir = build_tiny_checkpoint(os.path.join(workdir, 'model'), texts, label_to_id, seed=args.seed)
+
+    recognizer = IntentRecognizer(num_labels=len(label_to_id), model_name=model_dir, label_to_id=label_to_id)
+    recognizer.model.eval()
+    # The utterance pool is small and reused across every configuration, so a prediction cache would turn all but the
+    # first run into dictionary lookups; the benchmark measures inference.
+    bot_manager = BotAssistantManager(model_dir=model_dir, dataset=dataset_csv, cache_size=0)
+    assistant = AssistantManager(dataset=dataset_csv, model_name=model_dir)
+    tokenizer = bot_manager.tokenizer
+
+    results = []
+    for threads in args.threads:
+        torch.set_num_threads(threads)
+        for seq_len in args.seq_lengths:
+            pool = make_utterances(tokenizer, texts, seq_len, 256, rng)
+            for batch_size in args.batch_sizes:
+                calls = args.warmup + args.iterations
+                batches = [[rng.choice(pool) for _ in range(batch_size)] for _ in range(calls)]
+
+                for mc_samples in args.mc_samples:
+                    latencies, elapsed = time_calls(
+                        lambda batch: recognizer.recognize_intents(batch, mc_dropout=mc_samples > 1, num_mc_samples=mc_samples),
+                        batches, args.warmup)
+                    results.append(summarize('recognizer', latencies, elapsed, batch_size, seq_len, threads, mc_samples))
+
+                latencies, elapsed = time_calls(bot_manager.process_inputs, batches, args.warmup)
+                results.append(summarize('bot_manager', latencies, elapsed, batch_size, seq_len, threads, 1))
+
+            # The CLI loop handles one message at a time, so it is only measured at batch size 1.
+            batches = [rng.choice(pool) for _ in range(args.warmup + args.iterations)]
+            latencies, elapsed = time_calls(assistant.process_input, batches, args.warmup)
+            results.append(summarize('cli', latencies, elapsed, 1, seq_len, threads, 1))
+
+            print(f"threads={threads} seq_len={seq_len} done")
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'torch': torch.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+        'results': results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline CPU latency benchmarks for the intent recognizer, the bot manager and the CLI loop.")
+    parser.add_argument('--batch-sizes', type=parse_int_list, default=[1, 8, 32])
+    parser.add_argument('--seq-lengths', type=parse_int_list, default=[8, 32, 128])
+    parser.add_argument('--threads', type=parse_int_list, default=sorted({1, os.cpu_count() or 1}))
+    parser.add_argument('--mc-samples', type=parse_int_list, default=[1, 10])
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--num-samples', type=int, default=2000, help="Rows of synthetic data to generate")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help="Previous results file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed relative slowdown before a result counts as a regression")
+    args = parser.parse_args()
+
+    output_path = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+
+    report = run(args)
+    if baseline_path:
+        with open(baseline_path, 'r', encoding='utf-8') as file:
+            report['regressions'] = compare_to_baseline(report['results'], json.load(file), args.tolerance)
+
+    with open(output_path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=4)
+    print(f"Benchmark results saved to {output_path}")
+
+    if report.get('regressions'):
+        for regression in report['regressions']:
+            print(f"Regression in {regression['key']}: {regression['metric']} {regression['baseline']:.3f} -> {regression['current']:.3f}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import io
+import os
+import random
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import sentencepiece as spm
+import torch
+from transformers import AutoTokenizer, XLMRobertaConfig, XLMRobertaForSequenceClassification, XLMRobertaTokenizer
+
+from Dataset.generate_dataset import generate_dataset
+from NeuralNetwork.model import save_label_map
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PHRASES_FILE = os.path.join(ROOT_DIR, 'Dataset', 'Resources', '_dataset.assets', 'updated_phrase.json')
+
+def build_synthetic_dataset(output_csv, num_samples=2000, seed=0):
+    random.seed(seed)
+    generate_dataset(PHRASES_FILE, output_csv, num_samples=num_samples)
+    return pd.read_csv(output_csv)
+
+def build_tiny_checkpoint(output_dir, texts, label_to_id, vocab_size=2000, hidden_size=64, num_layers=2, seed=0):
+    # A SentencePiece model trained on the synthetic corpus stands in for the xlm-roberta-base vocab,
+    # so both the slow and the fast tokenizer load from disk without touching the hub.
+    os.makedirs(output_dir, exist_ok=True)
+    spm_model = io.BytesIO()
+    spm.SentencePieceTrainer.train(
+        sentence_iterator=iter(texts),
+        model_writer=spm_model,
+        vocab_size=vocab_size,
+        model_type='unigram',
+        character_coverage=1.0,
+        hard_vocab_limit=False,
+    )
+    vocab_file = os.path.join(output_dir, 'sentencepiece.bpe.model')
+    with open(vocab_file, 'wb') as file:
+        file.write(spm_model.getvalue())
+
+    XLMRobertaTokenizer(vocab_file=vocab_file).save_pretrained(output_dir)
+    tokenizer = AutoTokenizer.from_pretrained(output_dir, use_fast=True)
+    tokenizer.save_pretrained(output_dir)
+
+    torch.manual_seed(seed)
+    config = XLMRobertaConfig(
+        vocab_size=len(tokenizer),
+        hidden_size=hidden_size,
+        num_hidden_layers=num_layers,
+        num_attention_heads=2,
+        intermediate_size=hidden_size * 4,
+        max_position_embeddings=514,
+        type_vocab_size=1,
+        pad_token_id=tokenizer.pad_token_id,
+        bos_token_id=tokenizer.bos_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+        num_labels=len(label_to_id),
+        id2label={idx: label for label, idx in label_to_id.items()},
+        label2id=dict(label_to_id),
+    )
+    XLMRobertaForSequenceClassification(config).save_pretrained(output_dir)
+    save_label_map(label_to_id, output_dir)
+    return output_dir
@@ -11,7 +11,8 @@ def main():
     print("2. Start from checkpoint")
     print("3. Sample and save data for retraining")
     print("4. Load model from checkpoint and retrain with a new dataset")
-    choice = input("Enter your choice (1, 2, 3, 4): ")
+    print("5. Incrementally fine-tune a checkpoint on new feedback")
+    choice = input("Enter your choice (1, 2, 3, 4, 5): ")
 
     if choice == '1':
         dataset = input("Enter the dataset path: ")
@@ -29,6 +30,10 @@ def main():
         new_dataset = input("Enter the new dataset path: ")
         assistant = AssistantManager()
         assistant.load_and_retrain(checkpoint_path, new_dataset)
+    elif choice == '5':
+        checkpoint_path = input("Enter the deployed checkpoint path: ")
+        assistant = AssistantManager()
+        assistant.incremental_retrain(checkpoint_path)
     else:
         print("Invalid choice. Exiting.")
 
@@ -55,6 +60,8 @@ def main():
 
         save_rating(user_input, response, int(rating), intent, expected_intent, confidence)
 
+    print("Traffic:", assistant.traffic_stats.stats())
+
     evaluation_results = assistant.evaluate_model()
     print("Evaluation results:", evaluation_results)
 
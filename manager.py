@@ -1,87 +1,163 @@
-import sqlite3
+import json
+import os
 import pandas as pd
-from Preprocessing.data_preprocessing import DataPreprocessor
-from NeuralNetwork.model import IntentRecognizer, IntentDataset
-from torch.utils.data import DataLoader
+from Preprocessing.data_preprocessing import DataPreprocessor, read_label_map
+from Preprocessing.sharded_dataset import read_shard_meta
+from Preprocessing.tokenization import encode_batch
+from NeuralNetwork.model import IntentRecognizer, IntentDataset, MemmapIntentDataset, load_label_map, save_val_split
 from DB.database import *
 from ResponseGen.response_generation import ResponseGenerator
+from Serving.utterance_index import UtteranceIndex, TrafficStats, build_utterance_index
+
+RETRAIN_STATE_FILE = 'retrain_state.json'
 
 class AssistantManager:
-    def __init__(self, dataset="./Dataset/Resources/_dataset/dataset.csv"):
+    def __init__(self, dataset="./Dataset/Resources/_dataset/dataset.csv", model_name='xlm-roberta-base', index_threshold=0.8, shard_dir=None):
         self.dataset = dataset
-        self.data_preprocessor = DataPreprocessor()
-        feedback_data = fetch_feedback()
-        self.train_encodings, self.val_encodings, self.train_labels, self.val_labels, self.label_to_id = self.data_preprocessor.prepare_data(feedback_data=feedback_data, file_path=self.dataset)
-        
-        self.intent_recognizer = IntentRecognizer(num_labels=len(self.label_to_id))
+        self.shard_dir = shard_dir
+        self.index_threshold = index_threshold
+        self.utterance_index = None
+        self.traffic_stats = TrafficStats()
+        self.data_preprocessor = DataPreprocessor(tokenizer_name=model_name)
+        # Only the label map is needed to build the model; tokenizing the corpus is left to train_model.
+        if shard_dir:
+            self.label_to_id = read_shard_meta(os.path.join(shard_dir, 'train'))['label_to_id']
+        else:
+            self.label_to_id = read_label_map(self.dataset, feedback_data=fetch_feedback())
+
+        self.intent_recognizer = IntentRecognizer(num_labels=len(self.label_to_id), model_name=model_name, label_to_id=self.label_to_id)
         self.response_generator = ResponseGenerator(intent_labels={v: k for k, v in self.label_to_id.items()})
 
-    def train_model(self, dataset=None, resume_from_checkpoint=None):
+    def train_model(self, dataset=None, resume_from_checkpoint=None, shard_dir=None):
         if dataset:
             self.dataset = dataset
+        shard_dir = shard_dir or self.shard_dir
 
-        feedback_data = fetch_feedback()
-        train_encodings, val_encodings, train_labels, val_labels, label_to_id = self.data_preprocessor.prepare_data(feedback_data=feedback_data, file_path=self.dataset)
-        
-        train_dataset = IntentDataset(train_encodings, train_labels)
-        val_dataset = IntentDataset(val_encodings, val_labels)
-
-        train_loader = DataLoader(train_dataset, batch_size=8, shuffle=True, num_workers=4)
-        val_loader = DataLoader(val_dataset, batch_size=8, shuffle=False, num_workers=4)
+        if shard_dir:
+            # Pre-tokenized shards written by DataPreprocessor.build_shards are memory-mapped instead of re-read from CSV.
+            train_dataset = MemmapIntentDataset(os.path.join(shard_dir, 'train'))
+            val_dataset = MemmapIntentDataset(os.path.join(shard_dir, 'val'))
+            self.intent_recognizer.label_to_id = read_shard_meta(os.path.join(shard_dir, 'train'))['label_to_id']
+        else:
+            feedback_data = fetch_feedback()
+            train_encodings, val_encodings, train_labels, val_labels, label_to_id = self.data_preprocessor.prepare_data(feedback_data=feedback_data, file_path=self.dataset)
+            self.intent_recognizer.label_to_id = label_to_id
+            
+            train_dataset = IntentDataset(train_encodings, train_labels)
+            val_dataset = IntentDataset(val_encodings, val_labels)
 
         self.intent_recognizer.train(train_dataset, val_dataset, resume_from_checkpoint=resume_from_checkpoint)
+        if not shard_dir:
+            # Shard-trained checkpoints keep their held-out rows in shard_dir/val.
+            save_val_split(self.data_preprocessor.last_val_split, 'results')
+        self.build_utterance_index('results')
 
     def load_and_retrain(self, checkpoint_path, new_dataset):
         self.intent_recognizer.load_model(checkpoint_path, tokenizer_name='xlm-roberta-base')
         train_encodings, val_encodings, train_labels, val_labels, label_to_id = self.data_preprocessor.prepare_data(file_path=new_dataset)
+        self.intent_recognizer.label_to_id = label_to_id
         train_dataset = IntentDataset(train_encodings, train_labels)
         val_dataset = IntentDataset(val_encodings, val_labels)
         self.intent_recognizer.train(train_dataset, val_dataset, resume_from_checkpoint=None)
+        save_val_split(self.data_preprocessor.last_val_split, 'results')
+        # The model only saw new_dataset here, so the index must not answer from feedback it was never trained on.
+        self.build_utterance_index('results', dataset=new_dataset, include_feedback=False)
         self.evaluate_model(val_dataset)
 
-        self.intent_recognizer.train(train_dataset, val_dataset, resume_from_checkpoint=None)
+    def incremental_retrain(self, checkpoint_path, output_dir='results', replay_size=500, num_train_epochs=3, early_stopping_patience=1):
+        last_feedback_id = self.load_retrain_state(checkpoint_path).get('last_feedback_id', 0)
+        new_feedback = fetch_feedback_since(last_feedback_id)
+        if not new_feedback:
+            print(f"No new feedback since id {last_feedback_id}, nothing to retrain.")
+            return None
+
+        # Start from the deployed weights and keep its label ids so the new checkpoint stays drop-in compatible.
+        label_to_id = load_label_map(checkpoint_path) or self.label_to_id
+        self.intent_recognizer.label_to_id = label_to_id
+        self.intent_recognizer.load_model(checkpoint_path)
+
+        feedback_data = [row[1:] for row in new_feedback]
+        train_encodings, val_encodings, train_labels, val_labels, _ = self.data_preprocessor.prepare_incremental_data(
+            feedback_data, label_to_id, file_path=self.dataset, replay_size=replay_size)
+        print(f"Fine-tuning on {len(new_feedback)} new feedback rows plus {replay_size} replayed examples")
+
+        train_dataset = IntentDataset(train_encodings, train_labels)
+        val_dataset = IntentDataset(val_encodings, val_labels)
+        self.intent_recognizer.train(train_dataset, val_dataset, output_dir=output_dir, num_train_epochs=num_train_epochs,
+                                     warmup_steps=0, early_stopping_patience=early_stopping_patience)
+        save_val_split(self.data_preprocessor.last_val_split, output_dir)
+
+        self.build_utterance_index(output_dir)
+
+        state = {'last_feedback_id': new_feedback[-1][0]}
+        self.save_retrain_state(output_dir, state)
+        return state
+
+    def build_utterance_index(self, output_dir, dataset=None, include_feedback=True):
+        # Saved next to the checkpoint so the serving managers pick it up together with the weights.
+        # It is built from the same data the model was just trained on.
+        self.utterance_index = build_utterance_index(dataset or self.dataset, output_dir, label_to_id=self.intent_recognizer.label_to_id,
+                                                     feedback_data=fetch_feedback() if include_feedback else None, threshold=self.index_threshold)
+        return self.utterance_index
+
+    def load_retrain_state(self, checkpoint_path):
+        state_path = os.path.join(checkpoint_path, RETRAIN_STATE_FILE)
+        if not os.path.exists(state_path):
+            return {}
+        with open(state_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+    def save_retrain_state(self, save_directory, state):
+        with open(os.path.join(save_directory, RETRAIN_STATE_FILE), 'w', encoding='utf-8') as file:
+            json.dump(state, file, indent=4)
 
     def sample_and_save_data(self, sample_size=0.5, db_path='./DB/responses.db', original_file_path='./Dataset/Resources/_dataset/dataset.csv', output_file_path='./Dataset/Resources/_dataset/new_dataset.csv'):
         sample_df = self.data_preprocessor.sample_data(file_path=original_file_path, sample_size=sample_size)
-        conn = sqlite3.connect(db_path)
-        all_data_df = pd.read_sql_query("SELECT user_input AS text, expected_intent AS intent FROM responses", conn)
-        conn.close()
+        store = get_store(db_path)
+        store.flush()
+        all_data_df = pd.read_sql_query("SELECT user_input AS text, expected_intent AS intent FROM responses", store.connection)
         combined_df = pd.concat([sample_df, all_data_df], ignore_index=True)
         combined_df.to_csv(output_file_path, index=False)
         print(f"Sampled data saved successfully to {output_file_path}!")
         self.check_data_distribution(combined_df, "Combined Dataset")
 
 
+    def load_model(self, checkpoint_path, backend='torch', intra_op_threads=None, inter_op_threads=None):
+        label_to_id = load_label_map(checkpoint_path)
+        if label_to_id is not None:
+            self.label_to_id = label_to_id
+            self.intent_recognizer.label_to_id = label_to_id
+            self.response_generator = ResponseGenerator(intent_labels={v: k for k, v in label_to_id.items()})
+        self.intent_recognizer.load_model(checkpoint_path, backend=backend, intra_op_threads=intra_op_threads, inter_op_threads=inter_op_threads)
+        self.utterance_index = UtteranceIndex.load(checkpoint_path, threshold=self.index_threshold)
+
     def process_input(self, user_input):
-        intent_id, confidence = self.intent_recognizer.recognize_intent(user_input)
+        # Known training utterances, and close variants of them, are answered without a forward pass.
+        match = self.utterance_index.lookup(user_input) if self.utterance_index is not None else None
+        if match is not None and match[0] in self.intent_recognizer.label_to_id:
+            intent_id, confidence, source = self.intent_recognizer.label_to_id[match[0]], match[1], match[2]
+        else:
+            (intent_id, confidence), source = self.intent_recognizer.recognize_intent(user_input), 'model'
+        self.traffic_stats.record([source])
         response = self.response_generator.handle_intent(intent_id, confidence)
         intent_label = self.response_generator.intent_labels[intent_id] if intent_id is not None else "unknown"
         return response, confidence, intent_label
 
-    def evaluate_model(self):
-        _, val_encodings, _, val_labels, _ = self.data_preprocessor.prepare_data()
-        val_dataset = IntentDataset(val_encodings, val_labels)
-        val_loader = DataLoader(val_dataset, batch_size=8, shuffle=False, num_workers=4)
+    def evaluate_model(self, val_dataset=None):
+        if val_dataset is None:
+            _, val_encodings, _, val_labels, _ = self.data_preprocessor.prepare_data()
+            val_dataset = IntentDataset(val_encodings, val_labels)
         evaluation_results = self.intent_recognizer.evaluate(val_dataset)
         return evaluation_results
 
     def fetch_misclassified_examples(self, db_path='./DB/responses.db'):
-        conn = sqlite3.connect(db_path)
-        c = conn.cursor()
-        c.execute('''
-            SELECT user_input, expected_intent
-            FROM responses
-            WHERE intent != expected_intent OR confidence < 0.5
-        ''')
-        examples = c.fetchall()
-        conn.close()
-        return examples
+        return get_store(db_path).fetch_misclassified_examples()
 
     def update_training_data(self, misclassified_examples, label_to_id, tokenizer):
         texts = [example[0] for example in misclassified_examples]
         labels = [label_to_id[example[1]] for example in misclassified_examples]
 
-        encodings = tokenizer(texts, truncation=True, padding=True)
+        encodings = encode_batch(tokenizer, texts)
         return encodings, labels
 
     def check_data_distribution(self, df, title):
@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+# Tests always run on CPU and never reach out to the hub.
+os.environ.setdefault('CUDA_VISIBLE_DEVICES', '')
+os.environ.setdefault('HF_HUB_OFFLINE', '1')
+os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+
+def fit_tiny_model(model_dir, texts, labels, epochs=3, batch_size=32, learning_rate=1e-3, seed=0):
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    # A few epochs are enough for confident predictions, which is what the parity checks compare.
+    torch.manual_seed(seed)
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+    optimizer = torch.optim.AdamW(model.parameters(), lr=learning_rate)
+    model.train()
+    for _ in range(epochs):
+        for start in range(0, len(texts), batch_size):
+            batch = tokenizer(texts[start:start + batch_size], return_tensors='pt', truncation=True, padding=True)
+            loss = model(**batch, labels=torch.tensor(labels[start:start + batch_size])).loss
+            loss.backward()
+            optimizer.step()
+            optimizer.zero_grad()
+    model.eval()
+    model.save_pretrained(model_dir)
+
+@pytest.fixture(scope='session')
+def tiny_checkpoint(tmp_path_factory):
+    for module in ('torch', 'transformers', 'sentencepiece', 'pandas'):
+        pytest.importorskip(module)
+    from benchmarks.tiny_model import build_synthetic_dataset, build_tiny_checkpoint
+
+    workdir = tmp_path_factory.mktemp('tiny_checkpoint')
+    df = build_synthetic_dataset(str(workdir / 'dataset.csv'), num_samples=600, seed=0)
+    texts = df['text'].astype(str).tolist()
+    label_to_id = {intent: idx for idx, intent in enumerate(sorted(df['intent'].unique()))}
+    labels = [label_to_id[intent] for intent in df['intent']]
+
+    model_dir = build_tiny_checkpoint(str(workdir / 'model'), texts, label_to_id)
+    fit_tiny_model(model_dir, texts, labels)
+    return {'model_dir': model_dir, 'dataset': str(workdir / 'dataset.csv'), 'texts': texts, 'labels': labels, 'label_to_id': label_to_id}
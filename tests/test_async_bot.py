@@ -0,0 +1,110 @@
+import asyncio
+import os
+import socket
+import sys
+
+import pytest
+
+for module in ('aiohttp', 'telebot', 'torch', 'transformers'):
+    pytest.importorskip(module)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'TGBot'))
+
+from async_bot import AsyncTelegramBot, FeedbackState
+from fake_telegram_server import FakeTelegramServer
+
+CHAT_ID = 1000
+
+class StaticManager:
+    # Stands in for BotAssistantManager so the conversation flow is tested without a model.
+    def __init__(self):
+        self.feedback = []
+
+    def process_inputs(self, texts):
+        return [(f"reply to {text}", 0.9, 'greet', 2, 'model') for text in texts]
+
+    def save_user_feedback(self, *args):
+        self.feedback.append(args)
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+async def wait_for(predicate, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not met in time")
+        await asyncio.sleep(0.02)
+
+def run_against_fake_server(scenario):
+    async def main():
+        server = FakeTelegramServer(port=free_port())
+        await server.start()
+        manager = StaticManager()
+        bot = AsyncTelegramBot('123:TEST', assistant_manager=manager, api_url=server.api_url, delete_delay=0.05)
+        polling = asyncio.create_task(bot.bot.infinity_polling(interval=0, timeout=1))
+        try:
+            await scenario(server, bot, manager)
+        finally:
+            polling.cancel()
+            await asyncio.gather(polling, return_exceptions=True)
+            await bot.bot.close_session()
+            bot.inference_queue.stop()
+            await server.stop()
+
+    asyncio.run(main())
+
+def test_reply_rating_and_expected_intent_flow():
+    async def scenario(server, bot, manager):
+        user_message = server.push_text(CHAT_ID, 'hello')
+        await wait_for(lambda: len(server.messages_for(CHAT_ID)) >= 2)
+        reply, rating_prompt = server.messages_for(CHAT_ID)[:2]
+        assert 'reply to hello' in reply['text']
+        assert 'Источник: model' in reply['text']
+        assert 'keyboard' in rating_prompt['reply_markup']
+        assert bot.sessions[CHAT_ID].state == FeedbackState.AWAITING_RATING
+        await wait_for(lambda: (CHAT_ID, user_message['message_id']) in server.deleted_messages)
+
+        server.push_text(CHAT_ID, '4')
+        await wait_for(lambda: CHAT_ID in bot.sessions and bot.sessions[CHAT_ID].state == FeedbackState.AWAITING_INTENT)
+        session = bot.sessions[CHAT_ID]
+        assert session.rating == 4
+
+        intent_message = server.push_text(CHAT_ID, 'greet')
+        await wait_for(lambda: manager.feedback)
+        assert manager.feedback == [('hello', 'reply to hello', 4, 'greet', 'greet', 0.9)]
+        assert CHAT_ID not in bot.sessions
+
+        thank_you = server.messages_for(CHAT_ID)[-1]
+        expected_deletes = session.message_ids + [thank_you['message_id'], intent_message['message_id']]
+        await wait_for(lambda: all((CHAT_ID, message_id) in server.deleted_messages for message_id in expected_deletes))
+
+    run_against_fake_server(scenario)
+
+def test_non_rating_text_starts_a_new_exchange():
+    async def scenario(server, bot, manager):
+        server.push_text(CHAT_ID, 'hello')
+        await wait_for(lambda: CHAT_ID in bot.sessions)
+
+        server.push_text(CHAT_ID, 'what time is it')
+        await wait_for(lambda: bot.sessions[CHAT_ID].user_input == 'what time is it')
+        assert bot.sessions[CHAT_ID].state == FeedbackState.AWAITING_RATING
+        assert not manager.feedback
+
+    run_against_fake_server(scenario)
+
+def test_unknown_expected_intent_is_rejected():
+    async def scenario(server, bot, manager):
+        server.push_text(CHAT_ID, 'hello')
+        await wait_for(lambda: CHAT_ID in bot.sessions)
+        server.push_text(CHAT_ID, '2')
+        await wait_for(lambda: bot.sessions[CHAT_ID].state == FeedbackState.AWAITING_INTENT)
+
+        server.push_text(CHAT_ID, 'not an intent')
+        await wait_for(lambda: 'Некорректное намерение' in server.messages_for(CHAT_ID)[-1]['text'])
+        assert bot.sessions[CHAT_ID].state == FeedbackState.AWAITING_INTENT
+        assert not manager.feedback
+
+    run_against_fake_server(scenario)
@@ -0,0 +1,47 @@
+import threading
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from Serving.batching import MicroBatcher
+
+class GatedBatch:
+    # Holds the first batch until released, so later submissions pile up in the queue behind it.
+    def __init__(self):
+        self.release = threading.Event()
+        self.batches = []
+
+    def __call__(self, payloads):
+        self.release.wait(timeout=5)
+        self.batches.append(list(payloads))
+        return [payload * 2 for payload in payloads]
+
+def test_cancelled_requests_are_skipped_and_worker_survives():
+    process_batch = GatedBatch()
+    batcher = MicroBatcher(process_batch, max_batch_size=1, max_wait_ms=1, num_workers=1)
+    try:
+        blocking = batcher.submit(1)
+        cancelled = batcher.submit(2)
+        assert cancelled.cancel()
+        process_batch.release.set()
+
+        assert blocking.result(timeout=5) == 2
+        assert batcher.submit(3).result(timeout=5) == 6
+        assert [2] not in process_batch.batches
+    finally:
+        batcher.stop(timeout=5)
+
+def test_failed_batch_fails_its_futures_only():
+    def process_batch(payloads):
+        if 'boom' in payloads:
+            raise ValueError('boom')
+        return payloads
+
+    batcher = MicroBatcher(process_batch, max_batch_size=1, max_wait_ms=1)
+    try:
+        with pytest.raises(ValueError):
+            batcher.submit('boom').result(timeout=5)
+        assert batcher.submit('ok').result(timeout=5) == 'ok'
+    finally:
+        batcher.stop(timeout=5)
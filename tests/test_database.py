@@ -0,0 +1,72 @@
+import multiprocessing
+
+import pytest
+
+from DB.database import FeedbackStore, get_store
+
+@pytest.fixture
+def store(tmp_path):
+    store = FeedbackStore(str(tmp_path / 'responses.db'), flush_interval=0.01)
+    for i in range(40):
+        # Every sortable column gets NULLs mixed in, which is where a row-value cursor used to stop early.
+        store.save_rating(None if i % 3 == 0 else f'input {i % 7}', 'response', None if i % 4 == 0 else i % 5 + 1,
+                          None if i % 5 == 0 else 'greet', 'greet', 0.5)
+    store.flush()
+    yield store
+    store.close()
+
+@pytest.mark.parametrize('sort_column', ['id', 'rating', 'user_input', 'intent'])
+@pytest.mark.parametrize('descending', [False, True])
+@pytest.mark.parametrize('page_size', [1, 3, 7])
+def test_fetch_page_walks_every_row_in_order(store, sort_column, descending, page_size):
+    seen, cursor = [], None
+    while True:
+        rows, cursor = store.fetch_page(page_size, cursor, sort_column=sort_column, descending=descending)
+        seen += [row[0] for row in rows]
+        if cursor is None:
+            break
+
+    direction = 'DESC' if descending else 'ASC'
+    expected = store.connection.execute(f'SELECT id FROM responses ORDER BY {sort_column} {direction}, id {direction}').fetchall()
+    assert seen == [row[0] for row in expected]
+
+def test_rows_rejected_by_sqlite_are_dropped_without_blocking_reads(tmp_path):
+    store = FeedbackStore(str(tmp_path / 'responses.db'), flush_interval=0.01)
+    try:
+        store.save_rating('good 1', 'response', 5, 'greet', 'greet', 0.9)
+        # A dict cannot be bound as a parameter, so this row can never be written.
+        store.save_rating({'not': 'bindable'}, 'response', 5, 'greet', 'greet', 0.9)
+        store.save_rating('good 2', 'response', 4, 'greet', 'greet', 0.8)
+        store.flush()
+
+        rows = store.connection.execute('SELECT user_input FROM responses ORDER BY id').fetchall()
+        assert [row[0] for row in rows] == ['good 1', 'good 2']
+        assert store.fetch_page(10)[0]
+        store.flush()
+    finally:
+        store.close()
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason="needs the fork start method")
+def test_forked_child_opens_its_own_store(tmp_path):
+    db_path = str(tmp_path / 'responses.db')
+    parent_store = get_store(db_path)
+    parent_store.save_rating('from parent', 'response', 5, 'greet', 'greet', 0.9)
+    parent_store.flush()
+
+    def write_from_child(results):
+        store = get_store(db_path)
+        store.save_rating('from child', 'response', 4, 'greet', 'greet', 0.8)
+        store.flush()
+        results.put(store is parent_store)
+
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    child = context.Process(target=write_from_child, args=(results,))
+    child.start()
+    reused_parent_store = results.get(timeout=10)
+    child.join(timeout=10)
+
+    assert child.exitcode == 0
+    assert not reused_parent_store
+    rows = parent_store.connection.execute('SELECT user_input FROM responses ORDER BY id').fetchall()
+    assert [row[0] for row in rows] == ['from parent', 'from child']
@@ -0,0 +1,18 @@
+import pytest
+
+pytest.importorskip('torch')
+pytest.importorskip('transformers')
+pytest.importorskip('onnx')
+pytest.importorskip('onnxruntime')
+
+from NeuralNetwork.onnx_export import check_output_parity, export_onnx
+
+@pytest.mark.parametrize('threads', [(None, None), (1, 1), (2, 1)])
+def test_onnx_export_matches_torch(tiny_checkpoint, threads):
+    model_dir = tiny_checkpoint['model_dir']
+    export_onnx(model_dir)
+    intra_op_threads, inter_op_threads = threads
+
+    report = check_output_parity(model_dir, texts=tuple(tiny_checkpoint['texts'][:16]),
+                                 intra_op_threads=intra_op_threads, inter_op_threads=inter_op_threads)
+    assert report['passed'], report
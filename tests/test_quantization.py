@@ -0,0 +1,30 @@
+import pytest
+
+torch = pytest.importorskip('torch')
+pd = pytest.importorskip('pandas')
+pytest.importorskip('transformers')
+
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+from NeuralNetwork.model import IntentDataset
+from NeuralNetwork.quantization import check_accuracy_parity, export_quantized_model, load_quantized_model
+
+def test_quantized_checkpoint_round_trips(tiny_checkpoint):
+    model_dir = tiny_checkpoint['model_dir']
+    exported = export_quantized_model(model_dir)
+    loaded = load_quantized_model(model_dir)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    batch = tokenizer(tiny_checkpoint['texts'][:16], return_tensors='pt', truncation=True, padding=True)
+    with torch.no_grad():
+        assert torch.allclose(exported(**batch).logits, loaded(**batch).logits)
+
+def test_quantized_accuracy_parity(tiny_checkpoint):
+    model_dir = tiny_checkpoint['model_dir']
+    export_quantized_model(model_dir)
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    texts, labels = tiny_checkpoint['texts'][:200], tiny_checkpoint['labels'][:200]
+    dataset = IntentDataset(tokenizer(texts, truncation=True), pd.Series(labels))
+
+    report = check_accuracy_parity(AutoModelForSequenceClassification.from_pretrained(model_dir), load_quantized_model(model_dir),
+                                   dataset, tokenizer, max_accuracy_drop=0.01)
+    assert report['passed'], report
@@ -0,0 +1,23 @@
+import pytest
+
+torch = pytest.importorskip('torch')
+pytest.importorskip('transformers')
+
+from NeuralNetwork.model import IntentRecognizer
+
+@pytest.fixture(scope='module')
+def recognizer(tiny_checkpoint):
+    label_to_id = tiny_checkpoint['label_to_id']
+    return IntentRecognizer(num_labels=len(label_to_id), model_name=tiny_checkpoint['model_dir'], label_to_id=label_to_id)
+
+def test_chunked_predictions_match_one_batch(recognizer, tiny_checkpoint):
+    texts = tiny_checkpoint['texts'][:50]
+    chunked = recognizer.recognize_intents(texts, threshold=0.0, batch_size=7)
+    whole = recognizer.recognize_intents(texts, threshold=0.0, batch_size=len(texts))
+    assert [intent_id for intent_id, _ in chunked] == [intent_id for intent_id, _ in whole]
+    assert [confidence for _, confidence in chunked] == pytest.approx([confidence for _, confidence in whole], abs=1e-5)
+
+def test_mc_dropout_restores_eval_mode(recognizer, tiny_checkpoint):
+    results = recognizer.recognize_intents(tiny_checkpoint['texts'][:10], mc_dropout=True, num_mc_samples=4, batch_size=3)
+    assert len(results) == 10
+    assert not any(module.training for module in recognizer.model.modules())
@@ -0,0 +1,32 @@
+import pytest
+
+pytest.importorskip('transformers')
+pytest.importorskip('sentencepiece')
+
+from transformers import AutoTokenizer
+from Preprocessing.tokenization import check_tokenizer_parity, encode_batch
+
+EDGE_CASES = (
+    "ru:Какая сегодня погода?",
+    "de:Wie spät ist es?  ",
+    "fr:Raconte-moi une blague, s'il te plaît",
+    "es:¿Qué hora es?",
+    "en:set an alarm for 7:30 am!!!",
+    "",
+    "ok",
+)
+
+def test_slow_and_fast_tokenizers_agree(tiny_checkpoint):
+    texts = list(dict.fromkeys(tiny_checkpoint['texts'])) + list(EDGE_CASES)
+    report = check_tokenizer_parity(tiny_checkpoint['model_dir'], texts)
+    assert report['mismatches'] == 0, report['examples']
+    assert report['passed']
+
+def test_encode_batch_matches_per_text_encoding(tiny_checkpoint):
+    tokenizer = AutoTokenizer.from_pretrained(tiny_checkpoint['model_dir'])
+    texts = tiny_checkpoint['texts'][:50] + list(EDGE_CASES)
+    # A batch size that does not divide the input exercises the chunk boundaries.
+    encodings = encode_batch(tokenizer, texts, batch_size=16)
+    for text, ids, mask in zip(texts, encodings['input_ids'], encodings['attention_mask']):
+        assert ids.tolist() == tokenizer(text, truncation=True)['input_ids']
+        assert mask.tolist() == [1] * len(ids)